@@ -0,0 +1,274 @@
+# Offline accuracy & throughput benchmark for the ANPR pipeline.
+#
+# Runs the same detection + OCR code as the API (recognizer.py) over a
+# folder of images whose file names are the true plate numbers
+# (e.g. number_plates/KMS6479.jpg) and writes the results as JSON.
+#
+# How to use (from the anpr_service folder):
+#   python benchmark.py number_plates --output bench.json
+#   python benchmark.py number_plates --output bench.json --baseline baseline.json
+#   python benchmark.py number_plates --camera checkpoint-01   (ROI / tiling mode)
+#
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+
+import cameras
+import recognizer
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Only files named like a plate are used as ground truth (skips e.g. plate.jpeg)
+PLATE_NAME_PATTERN = re.compile(r'^[A-Z]{1,3}[0-9]{3,4}$')
+
+STAGES = ("read", "decode", "detect", "ocr", "total")
+
+
+# ==============================
+# 1. Metrics helpers
+# ==============================
+def normalize_plate(text: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]', '', text).upper()
+
+
+def edit_distance(a: str, b: str) -> int:
+    # Classic Levenshtein distance, one row at a time
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,           # deletion
+                current[j - 1] + 1,        # insertion
+                previous[j - 1] + (ca != cb),  # substitution
+            ))
+        previous = current
+    return previous[-1]
+
+
+def char_accuracy(predicted: str, truth: str) -> float:
+    if not truth:
+        return 0.0
+    return max(0.0, 1.0 - edit_distance(predicted, truth) / len(truth))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    # Nearest-rank percentile, good enough for a few hundred samples
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB (None if unknown)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        if sys.platform == "darwin":
+            return peak / (1024 * 1024)
+        return peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil  # Windows fallback, only if installed
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return None
+
+
+# ==============================
+# 2. Run the pipeline over the images
+# ==============================
+def collect_images(image_dir: str) -> tuple[list[tuple[str, str]], list[str]]:
+    labelled, skipped = [], []
+    for name in sorted(os.listdir(image_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        truth = normalize_plate(stem)
+        if PLATE_NAME_PATTERN.match(truth):
+            labelled.append((os.path.join(image_dir, name), truth))
+        else:
+            skipped.append(name)
+    return labelled, skipped
+
+
+def run_image(path: str, truth: str, camera: dict = None) -> dict:
+    timings = {}
+    total_start = time.perf_counter()
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        contents = f.read()
+    timings["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    img = recognizer.decode_image(contents)
+    timings["decode"] = time.perf_counter() - start
+
+    height, width = img.shape[:2]
+    regions = cameras.detection_regions(camera, width, height)
+    plates = recognizer.read_plates(img, timings, regions=regions)
+    timings["total"] = time.perf_counter() - total_start
+
+    predictions = [normalize_plate(p) for p in plates]
+    best = max(predictions, key=lambda p: char_accuracy(p, truth), default="")
+
+    return {
+        "image": os.path.basename(path),
+        "truth": truth,
+        "predictions": predictions,
+        "exact_match": truth in predictions,
+        "char_accuracy": round(char_accuracy(best, truth), 4),
+        "timings_ms": {stage: round(timings.get(stage, 0.0) * 1000, 2) for stage in STAGES},
+    }
+
+
+def run_benchmark(image_dir: str, repeat: int = 1, warmup: int = 1, camera_id: str = None) -> dict:
+    images, skipped = collect_images(image_dir)
+    if not images:
+        raise SystemExit(f"No labelled images found in '{image_dir}'")
+
+    camera = None
+    if camera_id:
+        camera = cameras.load_camera_config().get(camera_id)
+        if camera is None:
+            raise SystemExit(f"Camera '{camera_id}' is not in {cameras.CAMERA_CONFIG_FILE}")
+
+    # Warm-up runs are not measured (first YOLO/EasyOCR calls are much slower)
+    for path, truth in images[:warmup]:
+        run_image(path, truth, camera)
+
+    runs = []
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        for path, truth in images:
+            runs.append(run_image(path, truth, camera))
+    wall_time = time.perf_counter() - wall_start
+
+    # Accuracy is reported for the first pass only (later passes are identical)
+    first_pass = runs[:len(images)]
+    latency = {}
+    for stage in STAGES:
+        samples = [r["timings_ms"][stage] for r in runs]
+        latency[stage] = {
+            "p50": percentile(samples, 50),
+            "p90": percentile(samples, 90),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+            "max": max(samples),
+            "mean": round(sum(samples) / len(samples), 2),
+        }
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "image_dir": image_dir,
+        "camera_id": camera_id,
+        "images": len(images),
+        "skipped": skipped,
+        "repeat": repeat,
+        "summary": {
+            "exact_match": round(sum(r["exact_match"] for r in first_pass) / len(first_pass), 4),
+            "char_accuracy": round(sum(r["char_accuracy"] for r in first_pass) / len(first_pass), 4),
+            "images_per_second": round(len(runs) / wall_time, 3),
+            "peak_memory_mb": peak_memory_mb(),
+        },
+        "latency_ms": latency,
+        "per_image": first_pass,
+    }
+
+
+# ==============================
+# 3. Compare against a stored baseline
+# ==============================
+def compare_to_baseline(current: dict, baseline: dict) -> list[tuple[str, float, float]]:
+    rows = []
+    for key in ("exact_match", "char_accuracy", "images_per_second", "peak_memory_mb"):
+        rows.append((key, baseline["summary"].get(key), current["summary"].get(key)))
+    for stage in STAGES:
+        for pct in ("p50", "p95"):
+            rows.append((
+                f"{stage}_{pct}_ms",
+                baseline["latency_ms"].get(stage, {}).get(pct),
+                current["latency_ms"][stage][pct],
+            ))
+    return rows
+
+
+def print_report(result: dict, baseline: dict = None):
+    summary = result["summary"]
+    print("--- ANPR Benchmark ---")
+    print(f"Images:            {result['images']} (x{result['repeat']}), skipped: {result['skipped']}")
+    print(f"Exact match:       {summary['exact_match']:.2%}")
+    print(f"Char accuracy:     {summary['char_accuracy']:.2%}")
+    print(f"Images / second:   {summary['images_per_second']}")
+    print(f"Peak memory (MB):  {summary['peak_memory_mb']}")
+    print("Latency (ms):      p50 / p95 / p99")
+    for stage in STAGES:
+        lat = result["latency_ms"][stage]
+        print(f"  {stage:<8} {lat['p50']:>10} / {lat['p95']} / {lat['p99']}")
+
+    for r in result["per_image"]:
+        mark = "✅" if r["exact_match"] else "❌"
+        print(f"  {mark} {r['truth']:<10} -> {r['predictions']}")
+
+    if baseline:
+        print("--- Compared to baseline ---")
+        for key, old, new in compare_to_baseline(result, baseline):
+            if old is None or new is None:
+                print(f"  {key:<22} {old} -> {new}")
+            else:
+                print(f"  {key:<22} {old} -> {new} ({new - old:+.4g})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANPR accuracy and speed.")
+    parser.add_argument("image_dir", nargs="?", default="number_plates",
+                        help="Folder of images named by their true plate number")
+    parser.add_argument("--output", "-o", help="Write results to this JSON file")
+    parser.add_argument("--baseline", "-b", help="Previous results JSON to compare with")
+    parser.add_argument("--repeat", type=int, default=1, help="Measured passes over the images")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured warm-up images")
+    parser.add_argument("--camera", help="Use this camera's ROI/tiling config from cameras.json")
+    parser.add_argument("--max-accuracy-drop", type=float, default=None,
+                        help="Exit with code 1 if exact-match accuracy drops more than this vs the baseline")
+    args = parser.parse_args()
+
+    if not recognizer.model or not recognizer.reader:
+        raise SystemExit("Models are not loaded correctly. Check the log above.")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    result = run_benchmark(args.image_dir, repeat=args.repeat, warmup=args.warmup,
+                           camera_id=args.camera)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if baseline and args.max_accuracy_drop is not None:
+        drop = baseline["summary"]["exact_match"] - result["summary"]["exact_match"]
+        if drop > args.max_accuracy_drop:
+            print(f"🚨 Exact-match accuracy dropped by {drop:.2%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
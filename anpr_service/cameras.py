@@ -0,0 +1,100 @@
+# Per-camera detection regions for fixed checkpoint cameras.
+#
+# A fixed camera only ever sees plates in a known lane region, so instead of
+# running YOLO over the whole frame we can run it only on those regions,
+# optionally cut into overlapping tiles so small, distant plates are not
+# lost when YOLO downsizes a wide high-resolution frame.
+#
+# The config file is JSON, keyed by camera id (see cameras.example.json):
+#
+#   {
+#     "checkpoint-01": {
+#       "rois": [[0, 0.45, 1, 1]],
+#       "tiling": {"tile_size": 640, "overlap": 0.2}
+#     }
+#   }
+#
+# "rois" are [x1, y1, x2, y2] boxes, either in pixels or as fractions of
+# the frame (all values between 0 and 1). "tiling" is optional.
+#
+import json
+import os
+
+CAMERA_CONFIG_FILE = os.getenv("ANPR_CAMERA_CONFIG", "cameras.json")
+
+# Tiles smaller than this are merged into their neighbour instead
+MIN_TILE_FRACTION = 0.25
+
+
+def load_camera_config(path: str = CAMERA_CONFIG_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        config = json.load(f)
+
+    for camera_id, camera in config.items():
+        for roi in camera.get("rois", []):
+            if len(roi) != 4:
+                raise ValueError(f"Camera '{camera_id}': ROI {roi} must be [x1, y1, x2, y2]")
+        tiling = camera.get("tiling")
+        if tiling:
+            if tiling.get("tile_size", 0) <= 0:
+                raise ValueError(f"Camera '{camera_id}': tile_size must be positive")
+            if not 0 <= tiling.get("overlap", 0) < 1:
+                raise ValueError(f"Camera '{camera_id}': overlap must be between 0 and 1")
+    return config
+
+
+def _roi_to_pixels(roi, width: int, height: int) -> tuple[int, int, int, int]:
+    x1, y1, x2, y2 = roi
+    if all(0 <= v <= 1 for v in roi):
+        x1, x2 = x1 * width, x2 * width
+        y1, y2 = y1 * height, y2 * height
+    # Clamp to the frame
+    x1, x2 = max(0, int(x1)), min(width, int(x2))
+    y1, y2 = max(0, int(y1)), min(height, int(y2))
+    return x1, y1, x2, y2
+
+
+def _axis_starts(start: int, end: int, tile: int, step: int) -> list[int]:
+    length = end - start
+    if length <= tile:
+        return [start]
+    starts = list(range(start, end - tile, step))
+    # Last tile is aligned to the edge so nothing is cut off
+    if end - tile - starts[-1] < tile * MIN_TILE_FRACTION:
+        starts[-1] = end - tile
+    else:
+        starts.append(end - tile)
+    return starts
+
+
+def _tile(region, tile_size: int, overlap: float) -> list[tuple[int, int, int, int]]:
+    x1, y1, x2, y2 = region
+    step = max(1, int(tile_size * (1 - overlap)))
+    tiles = []
+    for ty in _axis_starts(y1, y2, tile_size, step):
+        for tx in _axis_starts(x1, x2, tile_size, step):
+            tiles.append((tx, ty, min(tx + tile_size, x2), min(ty + tile_size, y2)))
+    return tiles
+
+
+def detection_regions(camera: dict, width: int, height: int):
+    """
+    Return the list of (x1, y1, x2, y2) pixel regions the detector
+    should run on for this camera, or None to use the whole frame.
+    """
+    if not camera:
+        return None
+
+    regions = [_roi_to_pixels(roi, width, height) for roi in camera.get("rois", [])]
+    regions = [r for r in regions if r[2] > r[0] and r[3] > r[1]]
+
+    tiling = camera.get("tiling")
+    if tiling:
+        areas = regions or [(0, 0, width, height)]
+        regions = []
+        for area in areas:
+            regions.extend(_tile(area, tiling["tile_size"], tiling.get("overlap", 0.2)))
+
+    return regions or None
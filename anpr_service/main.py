@@ -1,38 +1,35 @@
-import cv2
-import easyocr
-from ultralytics import YOLO
-import re
-import numpy as np
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from pydantic import BaseModel
-import io
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware # Import CORS
 
 # ==============================
 # 1. Load Models (Do this ONCE on startup)
 # ==============================
-print("Loading YOLO model...")
-try:
-    # Make sure num.pt is in the same folder
-    model = YOLO("num.pt") 
-except Exception as e:
-    print(f"Error loading YOLO model 'num.pt': {e}")
-    model = None
+# Model loading and the detection/OCR pipeline live in recognizer.py
+import recognizer
+import cameras
+from rate_limit import RateLimitMiddleware
 
-print("Loading EasyOCR...")
-try:
-    # This will download models on its first run
-    reader = easyocr.Reader(['en']) 
-except Exception as e:
-    print(f"Error loading EasyOCR: {e}")
-    reader = None
+# Per-camera regions of interest / tiling (see cameras.py)
+camera_config = cameras.load_camera_config()
+print(f"Loaded detection regions for {len(camera_config)} camera(s).")
 
 print("Models loaded. Starting API...")
 app = FastAPI()
 
 # ==============================
-# 2. Add CORS Middleware (THE FIX)
+# 2. Add Rate Limiting & CORS Middleware (THE FIX)
 # ==============================
+# Inference is expensive: each user gets its own small budget, and each configured
+# camera (camera_id form field) its own as well (see rate_limit.py).
+# Added before CORS so 429 responses still get CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    routes=[("POST", "/recognize-plate", "anpr", "camera_id")],
+    key_values={"camera_id": set(camera_config)},
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], # Allows all origins (your frontend)
@@ -51,8 +48,12 @@ class RecognitionResponse(BaseModel):
 # 4. Create the API Endpoint
 # ==============================
 @app.post("/recognize-plate", response_model=RecognitionResponse)
-async def recognize_plate(file: UploadFile = File(...)):
-    if not model or not reader:
+async def recognize_plate(
+    file: UploadFile = File(...),
+    # Fixed cameras send their id so only their configured lane regions are scanned
+    camera_id: Optional[str] = Form(None)
+):
+    if not recognizer.model or not recognizer.reader:
         raise HTTPException(status_code=500, detail="Models are not loaded correctly. Check server logs.")
 
     # Read image from upload
@@ -60,41 +61,19 @@ async def recognize_plate(file: UploadFile = File(...)):
     
     # Convert bytes to OpenCV image
     try:
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None:
-            raise ValueError("Could not decode image.")
+        img = recognizer.decode_image(contents)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid image file: {e}")
 
     # --- 5. Your Detection & OCR Logic ---
-    plates_found = []
-    
     try:
-        results = model(img)
-        
-        for r in results:
-            for box in r.boxes:
-                # Get bounding box
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                # Crop the plate
-                plate = img[y1:y2, x1:x2]
-
-                # 6. OCR with EasyOCR
-                ocr_result = reader.readtext(plate)
-
-                # Combine all detected texts
-                plate_texts = []
-                for (bbox, text, prob) in ocr_result:
-                    cleaned = re.sub(r'[^A-Za-z0-9]', '', text)
-                    if cleaned:
-                        plate_texts.append(cleaned)
-
-                final_plate = ''.join(plate_texts)
+        # Cameras without a config (and manual uploads) use the whole frame
+        height, width = img.shape[:2]
+        regions = cameras.detection_regions(camera_config.get(camera_id), width, height)
 
-                if final_plate:
-                    plates_found.append(final_plate)
-                    print(f"✅ Found Plate: {final_plate}") # Server-side log
+        plates_found = recognizer.read_plates(img, regions=regions)
+        for final_plate in plates_found:
+            print(f"✅ Found Plate: {final_plate}") # Server-side log
 
     except Exception as e:
         print(f"Error during processing: {e}")
@@ -0,0 +1,302 @@
+# Rate limiting middleware (token buckets), shared by all three services.
+#
+# This file is the same in auth_service, vehicle_registry_service and
+# anpr_service - change it in all three (rate_limit_test.py in
+# vehicle_registry_service checks that they match).
+#
+# Every request takes one token from a bucket. Buckets refill at a steady
+# rate up to a burst size; an empty bucket means 429 Too Many Requests with
+# a Retry-After header saying when the next token is available.
+#
+# - Who: the JWT subject (user e-mail) when the request has a valid token,
+#   otherwise the client IP (logins, cameras without a token). Roles with
+#   heavier legitimate use (police, dmt) get ROLE_MULTIPLIERS x the budget.
+#   A route can also name a form field that splits the budget further, so
+#   officers logging in from behind one station NAT, or cameras sharing a
+#   link, do not share a bucket:
+#
+#     ("POST", "/login", "login", "username")        per username and IP
+#     ("POST", "/recognize-plate", "anpr", "camera_id")
+#
+#   The field is whatever the client sends, so `key_values` can limit it to
+#   known values (e.g. configured cameras); others use the caller's bucket.
+#   To read the field the middleware buffers the request body and replays it.
+# - What: each service maps its routes to a budget class, so expensive
+#   routes (ANPR inference, argon2 logins) have their own small budget and
+#   cannot use up the one for cheap lookups:
+#
+#     app.add_middleware(RateLimitMiddleware, routes=[("POST", "/login", "login")])
+#
+#   Add it BEFORE CORSMiddleware, so CORS (added later = outermost) also
+#   puts its headers on 429 responses.
+# - Where buckets live (RATE_LIMIT_BACKEND):
+#     "memory"             per process (default)
+#     "sqlite:<path>"      a SQLite file shared by all worker processes on
+#                          the host; a local stand-in for a shared store
+#   Write your own backend with the same take() method (e.g. Redis).
+#
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+
+# --- Configuration ---
+# Same as SECRET_KEY / ALGORITHM in auth_service/security.py
+JWT_SECRET_KEY = "your-very-secret-key-for-jwt"
+JWT_ALGORITHM = "HS256"
+
+# Budget classes: (tokens per second, burst)
+BUDGETS = {
+    "anpr": (0.5, 5),      # YOLO + OCR: a few frames, then one every 2 s
+    "login": (0.1, 5),     # argon2: 5 attempts, then one every 10 s
+    "report": (0.5, 10),   # search, reports, change feed
+    "lookup": (10.0, 60),  # plate/licence lookups, saved vehicles
+    "default": (5.0, 30),
+}
+ROLE_MULTIPLIERS = {"police": 5, "dmt": 5}
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# Only behind a reverse proxy that sets it; otherwise clients could pick their own IP
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0") == "1"
+# Longer form field values are cut, so keys stay small
+MAX_KEY_VALUE_LENGTH = 100
+FORM_CONTENT_TYPES = (b"application/x-www-form-urlencoded", b"multipart/form-data")
+
+
+def _take_from_bucket(tokens: float, updated: float, now: float, rate: float, burst: float,
+                      cost: float) -> tuple[bool, float, float]:
+    """Refill, then try to take `cost` tokens. Returns (allowed, tokens left, seconds until allowed)."""
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+# ==============================
+# 1. Backends
+# ==============================
+class MemoryBackend:
+    """Buckets in a dict; per process."""
+    blocking = False
+    # Forget full buckets once this many keys are tracked
+    MAX_KEYS = 100000
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> tuple[bool, float, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            allowed, tokens, retry_after = _take_from_bucket(tokens, updated, now, rate, burst, cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+        return allowed, tokens, retry_after
+
+    def _prune(self, now: float):
+        # A bucket untouched for burst/rate seconds is full again: same as absent
+        longest_refill = max(b / r for r, b in BUDGETS.values())
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < longest_refill}
+
+
+class SQLiteBackend:
+    """Buckets in a SQLite file, shared by every process that opens it."""
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit, transactions are explicit
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> tuple[bool, float, float]:
+        now = time.time()  # wall clock: shared between processes
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            allowed, tokens, retry_after = _take_from_bucket(tokens, updated, now, rate, burst, cost)
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens, retry_after
+
+
+def make_backend(spec: str):
+    kind, _, arg = spec.partition(":")
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(arg or "rate_limit.db")
+    raise ValueError(f"Unknown rate limit backend '{spec}' (use 'memory' or 'sqlite:<path>')")
+
+
+# ==============================
+# 2. Who is calling
+# ==============================
+@lru_cache(maxsize=4096)
+def _token_identity(token: str) -> Optional[tuple[str, Optional[str]]]:
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return (subject, payload.get("role")) if subject else None
+
+
+def client_identity(scope) -> tuple[str, Optional[str]]:
+    """("user:<sub>", role) for a valid bearer token, else ("ip:<address>", None)."""
+    headers = dict(scope["headers"])
+    auth = headers.get(b"authorization", b"").decode("latin-1")
+    if auth[:7].lower() == "bearer ":
+        identity = _token_identity(auth[7:].strip())
+        if identity:
+            return f"user:{identity[0]}", identity[1]
+
+    ip = scope["client"][0] if scope.get("client") else "unknown"
+    forwarded = headers.get(b"x-forwarded-for")
+    if TRUST_FORWARDED_FOR and forwarded:
+        ip = forwarded.decode("latin-1").split(",")[0].strip()
+    return f"ip:{ip}", None
+
+
+async def read_form_field(scope, receive, field: str):
+    """
+    Read the whole request body and return (value of form field `field` or
+    None, a receive callable that replays the body for the app).
+    """
+    messages = []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request" or not message.get("more_body", False):
+            break
+
+    async def replay():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    headers = dict(scope["headers"])
+    if not headers.get(b"content-type", b"").startswith(FORM_CONTENT_TYPES):
+        return None, replay
+
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.request")
+
+    async def body_once():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    try:
+        form = await Request(scope, body_once).form()
+    except Exception:
+        # Malformed form: no field; the app answers it
+        return None, replay
+    try:
+        value = form.get(field)
+    finally:
+        await form.close()
+    return (value[:MAX_KEY_VALUE_LENGTH] if isinstance(value, str) and value else None), replay
+
+
+# ==============================
+# 3. Middleware
+# ==============================
+class RateLimitMiddleware:
+    def __init__(self, app, routes: list[tuple] = (), backend=None,
+                 budgets: dict = None, enabled: bool = RATE_LIMIT_ENABLED,
+                 key_values: dict = None):
+        """
+        routes: (method, path prefix, budget class[, form field]); the first
+        match wins, unmatched requests use the "default" budget.
+        key_values: {form field: allowed values}; other values are ignored.
+        """
+        self.app = app
+        self.routes = [tuple(route) + (None,) * (4 - len(route)) for route in routes]
+        self.backend = backend or make_backend(RATE_LIMIT_BACKEND)
+        self.budgets = budgets or BUDGETS
+        self.enabled = enabled
+        self.key_values = key_values or {}
+
+    def budget_class(self, method: str, path: str) -> tuple[str, Optional[str]]:
+        """(budget class, form field to key by or None) for a request."""
+        for route_method, prefix, name, field in self.routes:
+            if method == route_method and path.startswith(prefix):
+                return name, field
+        return "default", None
+
+    async def __call__(self, scope, receive, send):
+        # CORS preflights are cheap and must never be limited
+        if scope["type"] != "http" or not self.enabled or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        name, field = self.budget_class(scope["method"], scope["path"])
+        identity, role = client_identity(scope)
+        rate, burst = self.budgets[name]
+        multiplier = ROLE_MULTIPLIERS.get(role, 1)
+        rate, burst = rate * multiplier, burst * multiplier
+
+        key = f"{name}:{identity}"
+        if field:
+            value, receive = await read_form_field(scope, receive, field)
+            allowed_values = self.key_values.get(field)
+            if value and (allowed_values is None or value in allowed_values):
+                key += f":{field}={value}"
+        try:
+            if self.backend.blocking:
+                allowed, _, retry_after = await run_in_threadpool(self.backend.take, key, rate, burst)
+            else:
+                allowed, _, retry_after = self.backend.take(key, rate, burst)
+        except Exception as e:
+            # Fail open: a broken limiter must not take the service down
+            print(f"Rate limiter backend error ({e}), letting request through")
+            allowed = True
+
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        wait = max(1, math.ceil(retry_after))
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests, please retry later"},
+            headers={
+                "Retry-After": str(wait),
+                "RateLimit-Limit": str(int(burst)),
+                "RateLimit-Remaining": "0",
+                "RateLimit-Reset": str(wait),
+            },
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,170 @@
+import re
+import time
+
+import cv2
+import easyocr
+import numpy as np
+from ultralytics import YOLO
+
+# ==============================
+# 1. Load Models (Do this ONCE on startup)
+# ==============================
+print("Loading YOLO model...")
+try:
+    # Make sure num.pt is in the same folder
+    model = YOLO("num.pt")
+except Exception as e:
+    print(f"Error loading YOLO model 'num.pt': {e}")
+    model = None
+
+print("Loading EasyOCR...")
+try:
+    # This will download models on its first run
+    reader = easyocr.Reader(['en'])
+except Exception as e:
+    print(f"Error loading EasyOCR: {e}")
+    reader = None
+
+
+# ==============================
+# 2. Detection & OCR Pipeline
+# ==============================
+# Shared by the API (main.py) and the offline benchmark (benchmark.py),
+# so both always measure the same code path.
+
+def decode_image(contents: bytes):
+    """Convert raw upload bytes into an OpenCV BGR image."""
+    nparr = np.frombuffer(contents, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image.")
+    return img
+
+
+# Boxes from overlapping tiles are the same plate when their intersection
+# covers more than this share of the smaller box. (IoU is not enough: a
+# plate cut by a tile edge is a small box inside the full one, e.g. 100 px
+# of a 250 px plate gives IoU 0.4 but overlap 1.0.)
+NMS_OVERLAP_THRESHOLD = 0.5
+# A box this close to a tile edge inside the frame was probably cut off by it
+TILE_EDGE_MARGIN = 2  # pixels
+
+
+def _detect_boxes(img, regions=None) -> list[tuple[int, int, int, int]]:
+    """
+    Run YOLO and return plate boxes in full-frame pixel coordinates.
+
+    With `regions`, the detector only sees those crops (in one batch);
+    their boxes are shifted back into frame coordinates and merged
+    with NMS, since overlapping tiles can each find the same plate.
+    Boxes cut by a tile edge lose to whole ones in the merge.
+    """
+    if not regions:
+        results = model(img, verbose=False)
+        return [tuple(map(int, box.xyxy[0])) for r in results for box in r.boxes]
+
+    crops = [img[y1:y2, x1:x2] for (x1, y1, x2, y2) in regions]
+    results = model(crops, verbose=False)
+
+    height, width = img.shape[:2]
+    boxes, scores, cut = [], [], []
+    for region, r in zip(regions, results):
+        rx, ry = region[0], region[1]
+        for box in r.boxes:
+            x1, y1, x2, y2 = box.xyxy[0].tolist()
+            frame_box = (x1 + rx, y1 + ry, x2 + rx, y2 + ry)
+            boxes.append(frame_box)
+            scores.append(float(box.conf[0]))
+            cut.append(touches_tile_edge(frame_box, region, width, height))
+
+    keep = non_max_suppression(np.array(boxes), np.array(scores), NMS_OVERLAP_THRESHOLD, np.array(cut))
+    return [tuple(map(int, boxes[i])) for i in keep]
+
+
+def touches_tile_edge(box, region, width: int, height: int, margin: int = TILE_EDGE_MARGIN) -> bool:
+    """True if the box reaches an edge of its tile that is not also an edge of the frame."""
+    x1, y1, x2, y2 = box
+    rx1, ry1, rx2, ry2 = region
+    return (
+        (rx1 > 0 and x1 - rx1 <= margin)
+        or (ry1 > 0 and y1 - ry1 <= margin)
+        or (rx2 < width and rx2 - x2 <= margin)
+        or (ry2 < height and ry2 - y2 <= margin)
+    )
+
+
+def non_max_suppression(boxes, scores, overlap_threshold: float, cut=None) -> list[int]:
+    """
+    Greedy NMS over (N, 4) xyxy boxes, by intersection over the smaller box.
+    Boxes flagged in `cut` (touching a tile edge) are considered after all
+    others, so a whole plate is kept over a partial one. Returns the indices to keep.
+    """
+    if len(boxes) == 0:
+        return []
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    if cut is None:
+        cut = np.zeros(len(boxes), dtype=bool)
+    # Whole boxes first, then by score
+    order = np.lexsort((-scores, cut))
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(int(i))
+        rest = order[1:]
+        ix1 = np.maximum(x1[i], x1[rest])
+        iy1 = np.maximum(y1[i], y1[rest])
+        ix2 = np.minimum(x2[i], x2[rest])
+        iy2 = np.minimum(y2[i], y2[rest])
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+        smaller = np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        order = rest[inter / smaller <= overlap_threshold]
+    return keep
+
+
+def read_plates(img, timings: dict = None, regions=None) -> list[str]:
+    """
+    Run YOLO detection and EasyOCR over a decoded image and
+    return the cleaned plate strings that were found.
+
+    `regions` is an optional list of (x1, y1, x2, y2) boxes (see
+    cameras.detection_regions); when given, everything outside
+    them is skipped.
+
+    If `timings` is given, the seconds spent in each stage are
+    added to it under the keys "detect" and "ocr".
+    """
+    plates_found = []
+
+    start = time.perf_counter()
+    boxes = _detect_boxes(img, regions)
+    detect_time = time.perf_counter() - start
+
+    ocr_time = 0.0
+    for (x1, y1, x2, y2) in boxes:
+        # Crop the plate
+        plate = img[y1:y2, x1:x2]
+
+        # OCR with EasyOCR
+        start = time.perf_counter()
+        ocr_result = reader.readtext(plate)
+        ocr_time += time.perf_counter() - start
+
+        # Combine all detected texts
+        plate_texts = []
+        for (bbox, text, prob) in ocr_result:
+            cleaned = re.sub(r'[^A-Za-z0-9]', '', text)
+            if cleaned:
+                plate_texts.append(cleaned)
+
+        final_plate = ''.join(plate_texts)
+
+        if final_plate:
+            plates_found.append(final_plate)
+
+    if timings is not None:
+        timings["detect"] = timings.get("detect", 0.0) + detect_time
+        timings["ocr"] = timings.get("ocr", 0.0) + ocr_time
+
+    return plates_found
@@ -9,12 +9,25 @@ from datetime import timedelta
 # Import our other files
 import models, schemas, security
 from database import SessionLocal, engine
+from rate_limit import RateLimitMiddleware
 
 # Create all database tables
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
 
+# --- Rate Limiting (see rate_limit.py) ---
+# Logins and user creation hash passwords with argon2: small budget. Logins are
+# keyed by username and IP, so officers behind one station NAT don't share it.
+# Added before CORS so 429 responses still get CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    routes=[
+        ("POST", "/login", "login", "username"),
+        ("POST", "/users/create", "login"),
+    ],
+)
+
 # --- CORS Middleware ---
 app.add_middleware(
     CORSMiddleware,
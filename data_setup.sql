@@ -26,6 +26,9 @@ CREATE DATABASE dmt_users WITH ENCODING = 'UTF8';
 -- in your 'users' table.
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Trigram matching for the vehicle search endpoint (GET /vehicles/search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- ---
 -- 3. CREATE TABLES
 -- ---
@@ -43,6 +46,10 @@ CREATE TABLE IF NOT EXISTS users (
     role VARCHAR(50) NOT NULL
 );
 
+-- Counter for vehicle changes (used by GET /vehicles/changes)
+DROP SEQUENCE IF EXISTS vehicle_row_version_seq;
+CREATE SEQUENCE vehicle_row_version_seq;
+
 -- Table 3.2: The 'vehicles' table (matches your \d vehicles)
 CREATE TABLE IF NOT EXISTS vehicles (
     vehicle_number VARCHAR(20) PRIMARY KEY,
@@ -54,9 +61,22 @@ CREATE TABLE IF NOT EXISTS vehicles (
     licence_valid_from DATE,
     licence_expiry_date DATE NOT NULL,
     district VARCHAR(100),
-    owner_nic VARCHAR(12)
+    owner_nic VARCHAR(12),
+    row_version BIGINT NOT NULL DEFAULT nextval('vehicle_row_version_seq')
 );
 
+CREATE INDEX IF NOT EXISTS ix_vehicles_row_version ON vehicles (row_version);
+
+-- Vehicles expiring on a given day (daily saved-vehicle expiry scan)
+CREATE INDEX IF NOT EXISTS ix_vehicles_licence_expiry_date ON vehicles (licence_expiry_date);
+
+-- Indexes for partial search over plate, owner name, NIC and licence number
+CREATE INDEX IF NOT EXISTS ix_vehicles_vehicle_number_trgm ON vehicles USING gin (vehicle_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_owner_name_trgm ON vehicles USING gin (owner_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_owner_nic_trgm ON vehicles USING gin (owner_nic gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_licence_number_trgm ON vehicles USING gin (licence_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_vehicle_number_prefix ON vehicles (vehicle_number text_pattern_ops);
+
 
 -- ---
 -- 4. INSERT ALL DATA
@@ -9,9 +9,13 @@ export const LIST_USERS_URL = `${AUTH_SERVICE_URL}/users`;
 const ANPR_SERVICE_URL = `${API_BASE_URL}:8002`;
 export const RECOGNIZE_PLATE_URL = `${ANPR_SERVICE_URL}/recognize-plate`;
 const REGISTRY_SERVICE_URL = `${API_BASE_URL}:8001`;
-export const GET_VEHICLE_BY_PLATE_URL = (plate) => `${REGISTRY_SERVICE_URL}/vehicles/${plate}`;
+// source: "manual" (typed in) or "anpr" (read from a photo), recorded in the lookup audit log
+export const GET_VEHICLE_BY_PLATE_URL = (plate, source = "manual") => `${REGISTRY_SERVICE_URL}/vehicles/${plate}?source=${source}`;
 export const GET_VEHICLE_BY_LICENSE_URL = (license) => `${REGISTRY_SERVICE_URL}/vehicles/license/${license}`;
 export const CREATE_VEHICLE_URL = `${REGISTRY_SERVICE_URL}/vehicles`;
 export const RENEW_LICENSE_URL = (plate) => `${REGISTRY_SERVICE_URL}/vehicles/${plate}/renew`;
 export const SAVE_VEHICLE_URL = (plate) => `${REGISTRY_SERVICE_URL}/saved-vehicles/${plate}`;
 export const GET_SAVED_VEHICLES_URL = `${REGISTRY_SERVICE_URL}/saved-vehicles`;
+// One page of the saved list; the next page's `after` comes in the X-Next-Cursor response header
+export const GET_SAVED_VEHICLES_PAGE_URL = (after = null, limit = 1000) =>
+    `${GET_SAVED_VEHICLES_URL}?limit=${limit}` + (after ? `&after=${encodeURIComponent(after)}` : "");
@@ -10,7 +10,7 @@ import {
     CREATE_VEHICLE_URL,
     RENEW_LICENSE_URL,
     SAVE_VEHICLE_URL,
-    GET_SAVED_VEHICLES_URL
+    GET_SAVED_VEHICLES_PAGE_URL
 } from './api.js';
 
 // === THEME HANDLING ===
@@ -370,7 +370,35 @@ function renderVehicleRegistration(user) {
                     </div>
                     <div class="input-group">
                         <label>District</label>
-                        <input type="text" id="v-district" required>
+                        <!-- Same list as partitions.DISTRICTS in the registry service -->
+                        <select id="v-district" required>
+                            <option value="" disabled selected>Select district</option>
+                            <option value="Ampara">Ampara</option>
+                            <option value="Anuradhapura">Anuradhapura</option>
+                            <option value="Badulla">Badulla</option>
+                            <option value="Batticaloa">Batticaloa</option>
+                            <option value="Colombo">Colombo</option>
+                            <option value="Galle">Galle</option>
+                            <option value="Gampaha">Gampaha</option>
+                            <option value="Hambantota">Hambantota</option>
+                            <option value="Jaffna">Jaffna</option>
+                            <option value="Kalutara">Kalutara</option>
+                            <option value="Kandy">Kandy</option>
+                            <option value="Kegalle">Kegalle</option>
+                            <option value="Kilinochchi">Kilinochchi</option>
+                            <option value="Kurunegala">Kurunegala</option>
+                            <option value="Mannar">Mannar</option>
+                            <option value="Matale">Matale</option>
+                            <option value="Matara">Matara</option>
+                            <option value="Monaragala">Monaragala</option>
+                            <option value="Mullaitivu">Mullaitivu</option>
+                            <option value="Nuwara Eliya">Nuwara Eliya</option>
+                            <option value="Polonnaruwa">Polonnaruwa</option>
+                            <option value="Puttalam">Puttalam</option>
+                            <option value="Ratnapura">Ratnapura</option>
+                            <option value="Trincomalee">Trincomalee</option>
+                            <option value="Vavuniya">Vavuniya</option>
+                        </select>
                     </div>
                 </div>
                 <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 10px;">
@@ -706,7 +734,7 @@ async function handlePlateScan() {
         resultBox.className = "scan-result-box";
         resultBox.textContent += " ... (Fetching details, Step 2/2)";
 
-        const registryResponse = await fetchWithAuth(GET_VEHICLE_BY_PLATE_URL(detectedPlate));
+        const registryResponse = await fetchWithAuth(GET_VEHICLE_BY_PLATE_URL(detectedPlate, "anpr"));
         const vehicleData = await registryResponse.json();
 
         if (!registryResponse.ok) throw new Error(vehicleData.detail || "Could not get vehicle details.");
@@ -861,7 +889,7 @@ async function handleAddVehicle() {
         addVehicleCardToDOM(vehicle);
 
         // Refresh notifications
-        const currentVehicles = await (await fetchWithAuth(GET_SAVED_VEHICLES_URL)).json();
+        const currentVehicles = await fetchSavedVehicles();
         checkNotifications(currentVehicles);
 
     } catch (error) {
@@ -880,13 +908,27 @@ if (loginForm) loginForm.addEventListener("submit", handleLogin);
 
 // === NOTIFICATION & SAVED VEHICLES HELPERS ===
 
+// Whole saved list, page by page. The server sends an ETag with
+// "Cache-Control: no-cache", so the browser revalidates each page and an
+// unchanged list comes back as 304 from the server (200 from cache here).
+async function fetchSavedVehicles() {
+    const vehicles = [];
+    let after = null;
+    do {
+        const response = await fetchWithAuth(GET_SAVED_VEHICLES_PAGE_URL(after));
+        if (!response.ok) throw new Error("Failed to load saved vehicles");
+        vehicles.push(...await response.json());
+        after = response.headers.get("X-Next-Cursor");
+    } while (after);
+    return vehicles;
+}
+
 async function loadSavedVehicles() {
     const vehiclesList = document.getElementById("my-vehicles-list");
     vehiclesList.innerHTML = '<p style="color: #666; font-style: italic;">Loading saved vehicles...</p>';
 
     try {
-        const response = await fetchWithAuth(GET_SAVED_VEHICLES_URL);
-        const vehicles = await response.json();
+        const vehicles = await fetchSavedVehicles();
 
         vehiclesList.innerHTML = "";
 
@@ -982,7 +1024,7 @@ async function handleRemoveVehicle(vehicle, cardElement) {
                 showToast("Vehicle Removed", `Unlinked ${vehicle.vehicle_number} successfully.`, "success", 3000);
 
                 // Refresh notifications
-                const remaining = await (await fetchWithAuth(GET_SAVED_VEHICLES_URL)).json();
+                const remaining = await fetchSavedVehicles();
                 checkNotifications(remaining);
 
                 const vehiclesList = document.getElementById("my-vehicles-list");
@@ -0,0 +1,16 @@
+-- Adds change tracking to an EXISTING 'vehicles' table
+-- (new databases get this from data_setup.sql).
+--
+-- How to use:
+--    psql -U postgres -d dmt_users -f migrations/001_vehicle_change_feed.sql
+--
+
+CREATE SEQUENCE IF NOT EXISTS vehicle_row_version_seq;
+
+-- Existing rows are numbered by the sequence as the column is added
+ALTER TABLE vehicles
+    ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT nextval('vehicle_row_version_seq');
+
+CREATE INDEX IF NOT EXISTS ix_vehicles_row_version ON vehicles (row_version);
+
+SELECT 'Change feed migration complete.' AS status;
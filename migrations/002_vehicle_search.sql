@@ -0,0 +1,20 @@
+-- Trigram indexes for GET /vehicles/search (partial plate, owner name,
+-- NIC and licence number search). Safe to run more than once.
+-- (new databases get this from data_setup.sql)
+--
+-- How to use:
+--    psql -U postgres -d dmt_users -f migrations/002_vehicle_search.sql
+--
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- GIN trigram indexes serve both ILIKE '%...%' and the similarity (%) operator
+CREATE INDEX IF NOT EXISTS ix_vehicles_vehicle_number_trgm ON vehicles USING gin (vehicle_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_owner_name_trgm ON vehicles USING gin (owner_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_owner_nic_trgm ON vehicles USING gin (owner_nic gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_vehicles_licence_number_trgm ON vehicles USING gin (licence_number gin_trgm_ops);
+
+-- Plain B-tree for plate prefix matches (LIKE 'KM%') under any collation
+CREATE INDEX IF NOT EXISTS ix_vehicles_vehicle_number_prefix ON vehicles (vehicle_number text_pattern_ops);
+
+SELECT 'Vehicle search migration complete.' AS status;
@@ -0,0 +1,151 @@
+-- Partitions the 'vehicles' table by district (PostgreSQL 13+).
+--
+-- Run AFTER 001_vehicle_change_feed.sql and 002_vehicle_search.sql:
+--    psql -U postgres -d dmt_users -f migrations/003_partition_vehicles_by_district.sql
+--
+-- What it does:
+--   1. Renames the current table to 'vehicles_unpartitioned' (kept as a backup).
+--   2. Creates 'vehicles' as a LIST-partitioned table: one partition per
+--      district (same names as partitions.DISTRICTS) plus 'vehicles_other'
+--      for anything else. Vehicles without a district get 'Unknown'.
+--   3. A partitioned table's primary key must include the partition key, so
+--      the key becomes (vehicle_number, district). Global uniqueness of
+--      vehicle_number and licence_number moves to a small 'vehicle_directory'
+--      table, kept in sync by a trigger; user_saved_vehicles now references it.
+--   4. Copies the data and recreates the indexes on every partition.
+--
+-- When everything works, drop the backup: DROP TABLE vehicles_unpartitioned;
+--
+
+BEGIN;
+
+ALTER TABLE vehicles RENAME TO vehicles_unpartitioned;
+ALTER TABLE user_saved_vehicles DROP CONSTRAINT IF EXISTS user_saved_vehicles_vehicle_number_fkey;
+
+-- Constraint and index names must be free for the new table
+ALTER TABLE vehicles_unpartitioned RENAME CONSTRAINT vehicles_pkey TO vehicles_unpartitioned_pkey;
+ALTER TABLE vehicles_unpartitioned RENAME CONSTRAINT vehicles_licence_number_key TO vehicles_unpartitioned_licence_number_key;
+ALTER INDEX IF EXISTS ix_vehicles_vehicle_number RENAME TO ix_vehicles_unpartitioned_vehicle_number;
+ALTER INDEX IF EXISTS ix_vehicles_row_version RENAME TO ix_vehicles_unpartitioned_row_version;
+ALTER INDEX IF EXISTS ix_vehicles_licence_expiry_date RENAME TO ix_vehicles_unpartitioned_licence_expiry_date;
+ALTER INDEX IF EXISTS ix_vehicles_vehicle_number_trgm RENAME TO ix_vehicles_unpartitioned_vehicle_number_trgm;
+ALTER INDEX IF EXISTS ix_vehicles_owner_name_trgm RENAME TO ix_vehicles_unpartitioned_owner_name_trgm;
+ALTER INDEX IF EXISTS ix_vehicles_owner_nic_trgm RENAME TO ix_vehicles_unpartitioned_owner_nic_trgm;
+ALTER INDEX IF EXISTS ix_vehicles_licence_number_trgm RENAME TO ix_vehicles_unpartitioned_licence_number_trgm;
+ALTER INDEX IF EXISTS ix_vehicles_vehicle_number_prefix RENAME TO ix_vehicles_unpartitioned_vehicle_number_prefix;
+
+-- ---
+-- 1. Partitioned table
+-- ---
+CREATE TABLE vehicles (
+    vehicle_number VARCHAR(20) NOT NULL,
+    licence_number VARCHAR(50) NOT NULL,
+    vehicle_class VARCHAR(100),
+    fuel_type VARCHAR(50),
+    owner_name VARCHAR(255),
+    owner_address VARCHAR(500),
+    licence_valid_from DATE,
+    licence_expiry_date DATE NOT NULL,
+    district VARCHAR(100) NOT NULL,
+    owner_nic VARCHAR(12),
+    row_version BIGINT NOT NULL DEFAULT nextval('vehicle_row_version_seq'),
+    PRIMARY KEY (vehicle_number, district)
+) PARTITION BY LIST (district);
+
+CREATE TABLE vehicles_ampara PARTITION OF vehicles FOR VALUES IN ('Ampara');
+CREATE TABLE vehicles_anuradhapura PARTITION OF vehicles FOR VALUES IN ('Anuradhapura');
+CREATE TABLE vehicles_badulla PARTITION OF vehicles FOR VALUES IN ('Badulla');
+CREATE TABLE vehicles_batticaloa PARTITION OF vehicles FOR VALUES IN ('Batticaloa');
+CREATE TABLE vehicles_colombo PARTITION OF vehicles FOR VALUES IN ('Colombo');
+CREATE TABLE vehicles_galle PARTITION OF vehicles FOR VALUES IN ('Galle');
+CREATE TABLE vehicles_gampaha PARTITION OF vehicles FOR VALUES IN ('Gampaha');
+CREATE TABLE vehicles_hambantota PARTITION OF vehicles FOR VALUES IN ('Hambantota');
+CREATE TABLE vehicles_jaffna PARTITION OF vehicles FOR VALUES IN ('Jaffna');
+CREATE TABLE vehicles_kalutara PARTITION OF vehicles FOR VALUES IN ('Kalutara');
+CREATE TABLE vehicles_kandy PARTITION OF vehicles FOR VALUES IN ('Kandy');
+CREATE TABLE vehicles_kegalle PARTITION OF vehicles FOR VALUES IN ('Kegalle');
+CREATE TABLE vehicles_kilinochchi PARTITION OF vehicles FOR VALUES IN ('Kilinochchi');
+CREATE TABLE vehicles_kurunegala PARTITION OF vehicles FOR VALUES IN ('Kurunegala');
+CREATE TABLE vehicles_mannar PARTITION OF vehicles FOR VALUES IN ('Mannar');
+CREATE TABLE vehicles_matale PARTITION OF vehicles FOR VALUES IN ('Matale');
+CREATE TABLE vehicles_matara PARTITION OF vehicles FOR VALUES IN ('Matara');
+CREATE TABLE vehicles_monaragala PARTITION OF vehicles FOR VALUES IN ('Monaragala');
+CREATE TABLE vehicles_mullaitivu PARTITION OF vehicles FOR VALUES IN ('Mullaitivu');
+CREATE TABLE vehicles_nuwara_eliya PARTITION OF vehicles FOR VALUES IN ('Nuwara Eliya');
+CREATE TABLE vehicles_polonnaruwa PARTITION OF vehicles FOR VALUES IN ('Polonnaruwa');
+CREATE TABLE vehicles_puttalam PARTITION OF vehicles FOR VALUES IN ('Puttalam');
+CREATE TABLE vehicles_ratnapura PARTITION OF vehicles FOR VALUES IN ('Ratnapura');
+CREATE TABLE vehicles_trincomalee PARTITION OF vehicles FOR VALUES IN ('Trincomalee');
+CREATE TABLE vehicles_vavuniya PARTITION OF vehicles FOR VALUES IN ('Vavuniya');
+CREATE TABLE vehicles_other PARTITION OF vehicles DEFAULT;
+
+-- ---
+-- 2. Global uniqueness + plate -> district directory
+-- ---
+CREATE TABLE vehicle_directory (
+    vehicle_number VARCHAR(20) PRIMARY KEY,
+    licence_number VARCHAR(50) NOT NULL UNIQUE,
+    district VARCHAR(100) NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION vehicles_sync_directory() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM vehicle_directory WHERE vehicle_number = OLD.vehicle_number;
+        RETURN OLD;
+    ELSIF TG_OP = 'INSERT' THEN
+        -- Fails (and so rolls back the insert) if the plate or licence number
+        -- is already registered in any district
+        INSERT INTO vehicle_directory (vehicle_number, licence_number, district)
+        VALUES (NEW.vehicle_number, NEW.licence_number, NEW.district);
+    ELSE
+        UPDATE vehicle_directory
+        SET vehicle_number = NEW.vehicle_number,
+            licence_number = NEW.licence_number,
+            district = NEW.district
+        WHERE vehicle_number = OLD.vehicle_number;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER vehicles_sync_directory
+    AFTER INSERT OR UPDATE OR DELETE ON vehicles
+    FOR EACH ROW EXECUTE FUNCTION vehicles_sync_directory();
+
+-- ---
+-- 3. Copy the data
+-- ---
+INSERT INTO vehicles (
+    vehicle_number, licence_number, vehicle_class, fuel_type,
+    owner_name, owner_address, licence_valid_from, licence_expiry_date,
+    district, owner_nic, row_version
+)
+SELECT
+    vehicle_number, licence_number, vehicle_class, fuel_type,
+    owner_name, owner_address, licence_valid_from, licence_expiry_date,
+    COALESCE(district, 'Unknown'), owner_nic, row_version
+FROM vehicles_unpartitioned;
+
+ALTER TABLE user_saved_vehicles
+    ADD CONSTRAINT user_saved_vehicles_vehicle_number_fkey
+    FOREIGN KEY (vehicle_number) REFERENCES vehicle_directory (vehicle_number);
+
+-- ---
+-- 4. Indexes (created on the parent, so every partition gets its own)
+-- ---
+CREATE INDEX ix_vehicles_row_version ON vehicles (row_version);
+CREATE INDEX ix_vehicles_licence_number ON vehicles (licence_number);
+CREATE INDEX ix_vehicles_licence_expiry_date ON vehicles (licence_expiry_date);
+CREATE INDEX ix_vehicles_vehicle_number_trgm ON vehicles USING gin (vehicle_number gin_trgm_ops);
+CREATE INDEX ix_vehicles_owner_name_trgm ON vehicles USING gin (owner_name gin_trgm_ops);
+CREATE INDEX ix_vehicles_owner_nic_trgm ON vehicles USING gin (owner_nic gin_trgm_ops);
+CREATE INDEX ix_vehicles_licence_number_trgm ON vehicles USING gin (licence_number gin_trgm_ops);
+CREATE INDEX ix_vehicles_vehicle_number_prefix ON vehicles (vehicle_number text_pattern_ops);
+
+ANALYZE vehicles;
+ANALYZE vehicle_directory;
+
+COMMIT;
+
+SELECT 'Vehicles partitioned by district.' AS status;
@@ -0,0 +1,25 @@
+-- One row per (user, vehicle) in user_saved_vehicles. Bulk saves use
+-- INSERT ... ON CONFLICT (user_id, vehicle_number) DO NOTHING, and the
+-- saved list is paged by plate, both backed by this unique index.
+-- Safe to run more than once.
+-- (new databases get the index when the registry service creates the table)
+--
+-- How to use:
+--    psql -U postgres -d dmt_users -f migrations/004_saved_vehicles_unique.sql
+--
+
+BEGIN;
+
+-- Older versions could save the same vehicle twice; keep the first row
+DELETE FROM user_saved_vehicles a
+USING user_saved_vehicles b
+WHERE a.user_id = b.user_id
+  AND a.vehicle_number = b.vehicle_number
+  AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_saved_vehicles_user_vehicle
+    ON user_saved_vehicles (user_id, vehicle_number);
+
+COMMIT;
+
+SELECT 'Saved vehicles migration complete.' AS status;
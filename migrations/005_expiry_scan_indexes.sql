@@ -0,0 +1,16 @@
+-- Indexes for the daily saved-vehicle expiry scan (expiry_scan.py).
+-- Safe to run more than once. Migration 003 also creates the vehicles index
+-- on the partitioned table, but not the user_saved_vehicles one.
+-- (new databases get them from data_setup.sql / the registry service)
+--
+-- How to use:
+--    psql -U postgres -d dmt_users -f migrations/005_expiry_scan_indexes.sql
+--
+
+-- Vehicles expiring on a given day
+CREATE INDEX IF NOT EXISTS ix_vehicles_licence_expiry_date ON vehicles (licence_expiry_date);
+
+-- Users who saved a given vehicle
+CREATE INDEX IF NOT EXISTS ix_user_saved_vehicles_vehicle_number ON user_saved_vehicles (vehicle_number);
+
+SELECT 'Expiry scan migration complete.' AS status;
@@ -0,0 +1,213 @@
+# Write-behind audit log of vehicle lookups.
+#
+# Every plate/licence check is a law-enforcement event that must be recorded,
+# but a synchronous INSERT per lookup would double its database cost. Instead
+# the endpoints call audit_log.record(...), which only appends to an
+# in-memory queue. A background thread writes the queue to the
+# lookup_events table in batches, whenever BATCH_SIZE events are waiting
+# or FLUSH_INTERVAL seconds have passed, and once more on shutdown.
+#
+# The queue is bounded. What happens when it is full (e.g. the database is
+# down for a while) is set by OVERFLOW_POLICY:
+#   "reject"      - record() raises AuditQueueFull; the endpoint answers 503,
+#                   so no lookup is ever served without being logged (default)
+#   "drop_oldest" - the oldest queued event is discarded
+#   "drop_newest" - the new event is discarded
+#
+# A batch the database rejects because of its data (not because it is
+# down) is written again row by row; rows that still fail are logged and
+# kept in dead_letters instead of blocking the queue.
+#
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from database import SessionLocal
+from models import LookupEvent
+
+MAX_QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2.0  # seconds
+OVERFLOW_POLICY = "reject"
+# Wait this long before retrying after a failed batch write
+RETRY_DELAY = 5.0
+# Rows the database refused, kept for inspection (newest last)
+MAX_DEAD_LETTERS = 1000
+# Longer queries (anything can be sent in the URL) are cut to fit the column
+MAX_QUERY_LENGTH = LookupEvent.__table__.c.query.type.length
+
+OVERFLOW_POLICIES = ("reject", "drop_oldest", "drop_newest")
+
+
+class AuditQueueFull(Exception):
+    pass
+
+
+class LookupAuditLog:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_queue_size: int = MAX_QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        overflow_policy: str = OVERFLOW_POLICY,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}")
+        self.session_factory = session_factory
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+
+        self._queue = deque()
+        self.dead_letters = deque(maxlen=MAX_DEAD_LETTERS)
+        self._cond = threading.Condition()
+        # Only one thread writes at a time (the flusher, or stop())
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        # Counters
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+
+    # --- Producer side (called from the endpoints) ---
+    def record(self, user_email: str, query: str, lookup_type: str, result_status: str, source: str):
+        """Queue one lookup event. Never touches the database."""
+        event = {
+            "user_email": user_email,
+            "query": query[:MAX_QUERY_LENGTH],
+            "lookup_type": lookup_type,
+            "result_status": result_status,
+            "source": source,
+            "created_at": datetime.utcnow(),
+        }
+        with self._cond:
+            if len(self._queue) >= self.max_queue_size:
+                if self.overflow_policy == "reject":
+                    self.rejected += 1
+                    raise AuditQueueFull("Lookup audit queue is full")
+                self.dropped += 1
+                if self.overflow_policy == "drop_newest":
+                    return
+                self._queue.popleft()
+
+            self._queue.append(event)
+            self.recorded += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    # --- Consumer side ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="lookup-audit-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the background thread and write everything still queued."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        while self._queue:
+            if not self.flush():
+                print(f"🚨 Lookup audit: {len(self._queue)} events could not be written on shutdown")
+                break
+
+    def flush(self) -> bool:
+        """Write one batch. Returns False if the database write failed."""
+        with self._write_lock:
+            with self._cond:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return True
+
+            try:
+                self._insert(batch)  # one executemany
+            except (DataError, IntegrityError) as e:
+                # Some row is bad: write the rows one by one so the others are not held up
+                self.failed_batches += 1
+                print(f"Lookup audit: batch write failed ({e.orig}), writing rows one by one")
+                return self._insert_rows(batch)
+            except Exception as e:
+                self.failed_batches += 1
+                print(f"Lookup audit: batch write failed ({e}), will retry")
+                self._requeue(batch)
+                return False
+
+            self.written += len(batch)
+            return True
+
+    def _insert(self, events: list[dict]):
+        db = self.session_factory()
+        try:
+            db.execute(insert(LookupEvent), events)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _insert_rows(self, batch: list[dict]) -> bool:
+        for i, event in enumerate(batch):
+            try:
+                self._insert([event])
+            except (DataError, IntegrityError) as e:
+                self.dead_lettered += 1
+                self.dead_letters.append(event)
+                print(f"🚨 Lookup audit: event could not be written ({e.orig}): {event}")
+            except Exception as e:
+                print(f"Lookup audit: write failed ({e}), will retry")
+                self._requeue(batch[i:])
+                return False
+            else:
+                self.written += 1
+        return True
+
+    def _requeue(self, events: list[dict]):
+        # Put them back in front so ordering is kept
+        with self._cond:
+            self._queue.extendleft(reversed(events))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._queue) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            # Drain full batches right away, then go back to waiting
+            while self._queue and not self._stopping:
+                if not self.flush():
+                    time.sleep(RETRY_DELAY)
+                    break
+                if len(self._queue) < self.batch_size:
+                    break
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queue),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+audit_log = LookupAuditLog()
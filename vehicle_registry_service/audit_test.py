@@ -0,0 +1,133 @@
+# Tests for the write-behind lookup audit log (audit.py).
+#
+# Uses an in-memory SQLite database in place of PostgreSQL. SQLite does not
+# enforce varchar lengths, so triggers add PostgreSQL's length checks to
+# show what happens to a batch with one row the database refuses.
+#
+# How to use:
+#   python audit_test.py
+#   (or: python -m pytest audit_test.py)
+#
+import os
+
+# database.py builds its engine on import; these tests bring their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import audit
+from models import LookupEvent
+
+
+def make_session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    LookupEvent.__table__.create(engine)
+    with engine.begin() as conn:
+        for column in LookupEvent.__table__.columns:
+            length = getattr(column.type, "length", None)
+            if length:
+                conn.exec_driver_sql(
+                    f"CREATE TRIGGER check_{column.name}_length BEFORE INSERT ON lookup_events "
+                    f"WHEN length(NEW.{column.name}) > {length} "
+                    f"BEGIN SELECT RAISE(ABORT, 'value too long for {column.name}'); END"
+                )
+    return sessionmaker(bind=engine)
+
+
+def written_queries(session_factory) -> list[str]:
+    db = session_factory()
+    try:
+        return list(db.scalars(select(LookupEvent.query).order_by(LookupEvent.id)))
+    finally:
+        db.close()
+
+
+def record(log: audit.LookupAuditLog, query: str, source: str = "manual"):
+    log.record("officer@police.lk", query, "plate", "VALID", source)
+
+
+def test_reject_policy_refuses_when_full():
+    log = audit.LookupAuditLog(make_session_factory(), max_queue_size=3, overflow_policy="reject")
+    for i in range(3):
+        record(log, f"CAB{i}")
+
+    try:
+        record(log, "CAB3")
+        assert False, "expected AuditQueueFull"
+    except audit.AuditQueueFull:
+        pass
+    assert log.stats()["queued"] == 3
+    assert log.rejected == 1 and log.dropped == 0
+
+
+def test_drop_oldest_keeps_the_newest_events():
+    session_factory = make_session_factory()
+    log = audit.LookupAuditLog(session_factory, max_queue_size=3, overflow_policy="drop_oldest")
+    for i in range(5):
+        record(log, f"CAB{i}")
+
+    assert log.dropped == 2 and log.rejected == 0
+    assert log.flush()
+    assert written_queries(session_factory) == ["CAB2", "CAB3", "CAB4"]
+
+
+def test_stop_writes_everything_still_queued():
+    session_factory = make_session_factory()
+    # Long interval: nothing is written by the timer during the test
+    log = audit.LookupAuditLog(session_factory, batch_size=10, flush_interval=60)
+    log.start()
+    for i in range(25):
+        record(log, f"CAB{i}")
+    log.stop()
+
+    assert written_queries(session_factory) == [f"CAB{i}" for i in range(25)]
+    assert log.stats()["queued"] == 0 and log.written == 25
+
+
+def test_one_bad_row_does_not_block_the_batch():
+    session_factory = make_session_factory()
+    log = audit.LookupAuditLog(session_factory, batch_size=10)
+    record(log, "CAB1")
+    record(log, "X" * 500)                   # any length can come in through the URL
+    record(log, "CAB2", source="s" * 40)     # refused by the database (varchar(20))
+    record(log, "CAB3")
+
+    assert log.flush()
+    queries = written_queries(session_factory)
+    assert queries == ["CAB1", "X" * audit.MAX_QUERY_LENGTH, "CAB3"]
+    assert log.failed_batches == 1 and log.dead_lettered == 1
+    assert log.dead_letters[0]["query"] == "CAB2"
+    assert log.stats()["queued"] == 0
+
+    # Later events keep flowing
+    record(log, "CAB4")
+    assert log.flush()
+    assert written_queries(session_factory)[-1] == "CAB4"
+
+
+def test_batch_is_kept_in_order_while_the_database_is_down():
+    def unavailable():
+        raise OperationalError("connect", {}, Exception("connection refused"))
+
+    log = audit.LookupAuditLog(unavailable, batch_size=2)
+    for i in range(3):
+        record(log, f"CAB{i}")
+
+    assert not log.flush()
+    assert [e["query"] for e in log._queue] == ["CAB0", "CAB1", "CAB2"]
+    assert log.dead_lettered == 0
+
+
+if __name__ == "__main__":
+    print("--- Lookup Audit Log Test ---")
+    test_reject_policy_refuses_when_full()
+    test_drop_oldest_keeps_the_newest_events()
+    test_stop_writes_everything_still_queued()
+    test_one_bad_row_does_not_block_the_batch()
+    test_batch_is_kept_in_order_while_the_database_is_down()
+    print("\n✅ SUCCESS: all audit log checks passed.")
@@ -0,0 +1,95 @@
+# Concurrency test for request coalescing (singleflight.py).
+#
+# Simulates a burst of identical plate lookups against a slow "database"
+# and checks that they share one query. Needs no database.
+#
+# How to use:
+#   python coalescing_test.py
+#   (or: python -m pytest coalescing_test.py)
+#
+import asyncio
+import threading
+import time
+
+from singleflight import SingleFlight
+
+QUERY_TIME = 0.2  # seconds each fake query takes
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, plate: str):
+        with self._lock:
+            self.queries += 1
+        time.sleep(QUERY_TIME)
+        if plate == "BOOM":
+            raise RuntimeError("database went away")
+        return {"vehicle_number": plate}
+
+
+async def _burst(flight: SingleFlight, db: FakeDatabase, plates: list[str]):
+    return await asyncio.gather(
+        *(flight.do(("plate", p), db.lookup, p) for p in plates),
+        return_exceptions=True,
+    )
+
+
+def _convoy():
+    flight, db = SingleFlight(), FakeDatabase()
+    # A convoy: 50 requests for one car, 10 for another
+    plates = ["KMS6479"] * 50 + ["XYZ8391"] * 10
+
+    start = time.perf_counter()
+    results = asyncio.run(_burst(flight, db, plates))
+    return flight, db, results, time.perf_counter() - start
+
+
+def test_concurrent_lookups_share_one_query():
+    flight, db, results, elapsed = _convoy()
+
+    assert db.queries == 2
+    assert flight.stats() == {"calls": 60, "executed": 2, "saved": 58, "in_flight": 0}
+    assert results[0] == {"vehicle_number": "KMS6479"}
+    assert results[-1] == {"vehicle_number": "XYZ8391"}
+    # Both queries ran in parallel, once each
+    assert elapsed < QUERY_TIME * 2
+
+
+def test_sequential_lookups_are_not_coalesced():
+    flight, db = SingleFlight(), FakeDatabase()
+
+    async def one_by_one():
+        for _ in range(3):
+            await flight.do(("plate", "KMS6479"), db.lookup, "KMS6479")
+
+    asyncio.run(one_by_one())
+    # Nothing was in flight when the next request came, so no stale sharing
+    assert db.queries == 3
+    assert flight.saved == 0
+
+
+def test_errors_are_shared_and_not_cached():
+    flight, db = SingleFlight(), FakeDatabase()
+
+    results = asyncio.run(_burst(flight, db, ["BOOM"] * 5))
+    assert db.queries == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    # The failed call is forgotten, so the next lookup tries again
+    asyncio.run(_burst(flight, db, ["BOOM"]))
+    assert db.queries == 2
+
+
+if __name__ == "__main__":
+    print("--- Request Coalescing Test ---")
+    test_concurrent_lookups_share_one_query()
+    flight, _, _, elapsed = _convoy()
+    stats = flight.stats()
+    print(f"{stats['calls']} concurrent lookups -> {stats['executed']} database queries "
+          f"({stats['saved']} saved) in {elapsed:.2f}s")
+    test_sequential_lookups_are_not_coalesced()
+    test_errors_are_shared_and_not_cached()
+    print("\n✅ SUCCESS: all coalescing checks passed.")
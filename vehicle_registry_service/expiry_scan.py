@@ -0,0 +1,333 @@
+# Daily expiry scan: notify users about saved vehicles whose licence is about to expire.
+#
+# Instead of every app polling /saved-vehicles to find out, one background
+# job per day finds all saved vehicles expiring in exactly N days, for each
+# N in EXPIRY_WINDOWS (default 30, 7, 1 and 0 days), with a single
+# set-based query:
+#
+#   SELECT s.user_id, u.email, v.vehicle_number, v.licence_expiry_date
+#   FROM user_saved_vehicles s
+#   JOIN vehicles v ON v.vehicle_number = s.vehicle_number
+#   JOIN users u ON u.id = s.user_id
+#   WHERE v.licence_expiry_date IN (today + 30, today + 7, today + 1, today)
+#
+# (ix_vehicles_licence_expiry_date finds the few vehicles expiring on those
+# days, ix_user_saved_vehicles_vehicle_number the users who saved them.)
+# Results are streamed and handed to a notification sink in batches.
+#
+# - Each day is claimed by inserting its expiry_scan_runs row, so it is
+#   scanned once even with several workers. A day missed because the
+#   service was down is caught up later (at most MAX_CATCH_UP_DAYS back).
+#   A claim left unfinished for STALE_CLAIM_AFTER (the worker crashed
+#   mid-scan) is taken over, and a failed scan releases its claim.
+# - Delivery is at-least-once: a scan that is retried after failing (or
+#   after a crash) part-way sends its earlier batches again. Senders should
+#   drop duplicates by (user_id, vehicle_number, scan_date).
+# - Sinks are pluggable (EXPIRY_NOTIFY_SINK): "file:<path>" appends JSON
+#   lines for a push/e-mail sender to pick up, "queue" keeps them in an
+#   in-process queue (tests). Write your own by subclassing NotificationSink.
+#
+import os
+import queue
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Optional
+
+import orjson
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import ExpiryScanRun, User, UserSavedVehicle, Vehicle
+
+# Days before expiry to notify at (0 = expires today)
+EXPIRY_WINDOWS = tuple(sorted(
+    {int(d) for d in os.getenv("EXPIRY_NOTIFY_DAYS", "30,7,1,0").split(",") if d.strip()},
+    reverse=True,
+))
+# Local time of day the scan runs
+EXPIRY_SCAN_TIME = dt_time.fromisoformat(os.getenv("EXPIRY_SCAN_TIME", "02:00"))
+EXPIRY_NOTIFY_SINK = os.getenv("EXPIRY_NOTIFY_SINK", "file:expiry_notifications.jsonl")
+
+BATCH_SIZE = 5000
+MAX_CATCH_UP_DAYS = 3
+# Wait this long before retrying after a failed scan
+RETRY_DELAY = 600.0  # seconds
+# An unfinished claim older than this belongs to a worker that died
+STALE_CLAIM_AFTER = 3600.0  # seconds
+
+
+# ==============================
+# 1. Notification sinks
+# ==============================
+class NotificationSink(ABC):
+    """
+    Receives notifications in batches. send() may be called from a background
+    thread, and may get the same notification again when a scan is retried.
+    """
+
+    @abstractmethod
+    def send(self, notifications: list[dict]):
+        ...
+
+    def close(self):
+        pass
+
+
+class FileSink(NotificationSink):
+    """Appends one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, notifications: list[dict]):
+        data = b"".join(orjson.dumps(n) + b"\n" for n in notifications)
+        with self._lock, open(self.path, "ab") as f:
+            f.write(data)
+
+
+class QueueSink(NotificationSink):
+    """Keeps notifications in a queue.Queue (stand-in for a message queue; used by tests)."""
+
+    def __init__(self, maxsize: int = 0):
+        self.queue = queue.Queue(maxsize)
+
+    def send(self, notifications: list[dict]):
+        for notification in notifications:
+            self.queue.put(notification)
+
+
+def make_sink(spec: str) -> NotificationSink:
+    kind, _, arg = spec.partition(":")
+    if kind == "file":
+        return FileSink(arg or "expiry_notifications.jsonl")
+    if kind == "queue":
+        return QueueSink()
+    raise ValueError(f"Unknown notification sink '{spec}' (use 'file:<path>' or 'queue')")
+
+
+# ==============================
+# 2. The scan
+# ==============================
+def expiring_saved_vehicles_query(scan_date: date, windows=EXPIRY_WINDOWS):
+    """The set-based join; returns (statement, {expiry date: window})."""
+    due = {scan_date + timedelta(days=w): w for w in windows}
+    stmt = (
+        select(
+            UserSavedVehicle.user_id,
+            User.email,
+            Vehicle.vehicle_number,
+            Vehicle.licence_expiry_date,
+        )
+        .join(Vehicle, Vehicle.vehicle_number == UserSavedVehicle.vehicle_number)
+        .join(User, User.id == UserSavedVehicle.user_id)
+        .where(Vehicle.licence_expiry_date.in_(list(due)))
+    )
+    return stmt, due
+
+
+def scan(session_factory, sink: NotificationSink, scan_date: date, today: date = None,
+         windows=EXPIRY_WINDOWS, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Send the notifications for one scan date; returns how many were sent.
+    `today` (default: scan_date) is what days_left is counted from, which
+    differs when catching up a missed day.
+    """
+    today = today or scan_date
+    stmt, due = expiring_saved_vehicles_query(scan_date, windows)
+
+    sent = 0
+    db = session_factory()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+        for rows in result.partitions(batch_size):
+            batch = []
+            for row in rows:
+                window = due[row.licence_expiry_date]
+                days_left = (row.licence_expiry_date - today).days
+                # Catching up: skip if a closer window has passed (or is today) too
+                if any(days_left <= w < window for w in windows):
+                    continue
+                batch.append({
+                    "user_id": row.user_id,
+                    "user_email": row.email,
+                    "vehicle_number": row.vehicle_number,
+                    "licence_expiry_date": row.licence_expiry_date,
+                    "days_left": days_left,
+                    "window": window,
+                    "scan_date": scan_date,
+                })
+            if batch:
+                sink.send(batch)
+                sent += len(batch)
+    finally:
+        db.close()
+    return sent
+
+
+# ==============================
+# 3. Scheduler
+# ==============================
+class ExpiryScanScheduler:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        sink: Optional[NotificationSink] = None,
+        windows=EXPIRY_WINDOWS,
+        scan_time: dt_time = EXPIRY_SCAN_TIME,
+    ):
+        self.session_factory = session_factory
+        self.sink = sink or make_sink(EXPIRY_NOTIFY_SINK)
+        self.windows = windows
+        self.scan_time = scan_time
+
+        self._thread = None
+        self._stop = threading.Event()
+        # One run at a time in this process (scheduled or triggered by hand)
+        self._run_lock = threading.Lock()
+
+        # Counters
+        self.runs = 0
+        self.failed_runs = 0
+        self.notified = 0
+        self.last_run: Optional[dict] = None
+
+    def _claim(self, scan_date: date) -> bool:
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            db.add(ExpiryScanRun(scan_date=scan_date, started_at=now, notified=0))
+            db.commit()
+            return True
+        except IntegrityError:
+            # Already scanned (or being scanned) by this or another worker
+            db.rollback()
+        finally:
+            db.close()
+
+        # Take over the claim if its worker died mid-scan. Only one worker's
+        # UPDATE can match, as it moves started_at past the cutoff.
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                update(ExpiryScanRun)
+                .where(
+                    ExpiryScanRun.scan_date == scan_date,
+                    ExpiryScanRun.finished_at.is_(None),
+                    ExpiryScanRun.started_at < now - timedelta(seconds=STALE_CLAIM_AFTER),
+                )
+                .values(started_at=now, notified=0)
+            )
+            db.commit()
+            return result.rowcount == 1
+        finally:
+            db.close()
+
+    def _finish(self, scan_date: date, notified: Optional[int]):
+        db = self.session_factory()
+        try:
+            if notified is None:
+                # Failed: release the day so it is retried
+                db.execute(delete(ExpiryScanRun).where(ExpiryScanRun.scan_date == scan_date))
+            else:
+                run = db.get(ExpiryScanRun, scan_date)
+                run.finished_at = datetime.utcnow()
+                run.notified = notified
+            db.commit()
+        finally:
+            db.close()
+
+    def due_dates(self, today: date) -> list[date]:
+        earliest = today - timedelta(days=MAX_CATCH_UP_DAYS)
+        db = self.session_factory()
+        try:
+            last = db.query(func.max(ExpiryScanRun.scan_date)).scalar()
+            # Running elsewhere, or left behind by a crash (_claim tells which)
+            unfinished = set(db.scalars(
+                select(ExpiryScanRun.scan_date).where(
+                    ExpiryScanRun.finished_at.is_(None),
+                    ExpiryScanRun.scan_date.between(earliest, today),
+                )
+            ))
+        finally:
+            db.close()
+        if last is None:
+            # First run ever: nothing to catch up
+            return [today]
+        start = max(earliest, last + timedelta(days=1))
+        missed = {start + timedelta(days=i) for i in range((today - start).days + 1)}
+        return sorted(missed | unfinished)
+
+    def run_due(self, today: date = None) -> list[dict]:
+        """Scan every day not scanned yet, up to today. Returns one summary per day scanned."""
+        today = today or date.today()
+        summaries = []
+        with self._run_lock:
+            for scan_date in self.due_dates(today):
+                if not self._claim(scan_date):
+                    continue
+                started = datetime.utcnow()
+                try:
+                    notified = scan(self.session_factory, self.sink, scan_date, today, self.windows)
+                except Exception:
+                    self.failed_runs += 1
+                    self._finish(scan_date, None)
+                    raise
+                self._finish(scan_date, notified)
+
+                self.runs += 1
+                self.notified += notified
+                self.last_run = {
+                    "scan_date": scan_date.isoformat(),
+                    "notified": notified,
+                    "seconds": round((datetime.utcnow() - started).total_seconds(), 3),
+                }
+                summaries.append(self.last_run)
+        return summaries
+
+    # --- Background thread ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="expiry-scan-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.sink.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = datetime.now()
+            if now.time() >= self.scan_time:
+                try:
+                    for summary in self.run_due(now.date()):
+                        print(f"Expiry scan {summary['scan_date']}: {summary['notified']} notifications "
+                              f"in {summary['seconds']}s")
+                    next_run = datetime.combine(now.date() + timedelta(days=1), self.scan_time)
+                except Exception as e:
+                    print(f"🚨 Expiry scan failed ({e}), retrying in {RETRY_DELAY:.0f}s")
+                    next_run = now + timedelta(seconds=RETRY_DELAY)
+            else:
+                next_run = datetime.combine(now.date(), self.scan_time)
+            self._stop.wait(max(1.0, (next_run - datetime.now()).total_seconds()))
+
+    def stats(self) -> dict:
+        return {
+            "windows": list(self.windows),
+            "scan_time": self.scan_time.isoformat(),
+            "sink": type(self.sink).__name__,
+            "runs": self.runs,
+            "failed_runs": self.failed_runs,
+            "notified": self.notified,
+            "last_run": self.last_run,
+        }
+
+
+expiry_scheduler = ExpiryScanScheduler()
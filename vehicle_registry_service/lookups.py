@@ -0,0 +1,65 @@
+# Coalesced vehicle lookups used by the GET /vehicles endpoints.
+#
+# Each lookup runs with its own short-lived read session (a replica when
+# configured, see replicas.py), not the request's get_db() session, because
+# one query can be shared by many requests. Results are returned as plain
+# dicts so they are safe to share.
+#
+# On the district-partitioned table (migration 003) a plate or licence
+# number says nothing about the partition, so a plain lookup probes the
+# index of every partition. The district is looked up in vehicle_directory
+# first, and the query then filters on it so only that partition is read.
+#
+import asyncio
+from typing import Optional
+
+import partitions
+from models import Vehicle
+from replicas import router
+from singleflight import SingleFlight
+
+# Columns needed to build a schemas.VehicleResponse
+VEHICLE_COLUMNS = (
+    Vehicle.vehicle_number,
+    Vehicle.licence_number,
+    Vehicle.vehicle_class,
+    Vehicle.fuel_type,
+    Vehicle.owner_name,
+    Vehicle.owner_address,
+    Vehicle.licence_valid_from,
+    Vehicle.licence_expiry_date,
+    Vehicle.district,
+    Vehicle.owner_nic,
+)
+
+vehicle_lookups = SingleFlight()
+
+
+def _fetch_vehicle(column, value: str, primary: bool) -> Optional[dict]:
+    with router.read_session(primary=primary) as db:
+        q = db.query(*VEHICLE_COLUMNS).filter(column == value)
+        if partitions.is_partitioned(db):
+            district = partitions.vehicle_district(db, column, value)
+            if district is None:
+                return None
+            q = q.filter(Vehicle.district == district)
+        row = q.first()
+        return dict(row._mapping) if row else None
+
+
+async def _find(kind: str, column, value: str, username: Optional[str]) -> Optional[dict]:
+    if router.recently_wrote(username):
+        # Read-your-writes: this user just changed something, so read from the
+        # primary and don't join a shared query that may have started earlier
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _fetch_vehicle, column, value, True)
+
+    return await vehicle_lookups.do((kind, value), _fetch_vehicle, column, value, False)
+
+
+async def find_vehicle_by_plate(cleaned_plate: str, username: Optional[str] = None) -> Optional[dict]:
+    return await _find("plate", Vehicle.vehicle_number, cleaned_plate, username)
+
+
+async def find_vehicle_by_license(cleaned_license: str, username: Optional[str] = None) -> Optional[dict]:
+    return await _find("license", Vehicle.licence_number, cleaned_license, username)
@@ -1,13 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from typing import Annotated
-from datetime import date
+from typing import Annotated, Literal, Optional
+from datetime import datetime
 import re
 
 
 import models, schemas, security # security.py is needed for get_current_user
+import changes
+import lookups
+import audit
+import search
+import partitions
+import saved_vehicles
+import responses
+import expiry_scan
+from rate_limit import RateLimitMiddleware
+from replicas import router as db_router
 from database import SessionLocal, engine
 from models import Vehicle
 
@@ -20,6 +32,35 @@ models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
 
+# --- Background Workers ---
+@app.on_event("startup")
+def start_background_workers():
+    audit.audit_log.start()
+    # Daily saved-vehicle expiry notifications (see expiry_scan.py)
+    expiry_scan.expiry_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    # Writes any lookup events still waiting in memory
+    audit.audit_log.stop()
+    expiry_scan.expiry_scheduler.stop()
+
+# --- Rate Limiting (see rate_limit.py) ---
+# Added before CORS so 429 responses still get CORS headers
+app.add_middleware(
+    RateLimitMiddleware,
+    routes=[
+        ("GET", "/vehicles/search", "report"),
+        ("GET", "/vehicles/changes", "report"),
+        ("GET", "/districts/", "report"),
+        ("GET", "/reports/", "report"),
+        ("GET", "/vehicles/", "lookup"),
+        ("GET", "/saved-vehicles", "lookup"),
+        ("POST", "/saved-vehicles", "lookup"),
+        ("DELETE", "/saved-vehicles", "lookup"),
+    ],
+)
+
 # --- Add CORS Middleware ---
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +68,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by the app's saved-vehicles refresh
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # --- Database Dependency ---
@@ -37,6 +80,13 @@ def get_db():
     finally:
         db.close()
 
+# --- Read-Only Database Dependency ---
+# Uses a read replica when configured (see replicas.py), except right
+# after this user made a change (read-your-writes)
+def get_read_db(token_user: Annotated[security.TokenData, Depends(get_current_user)]):
+    with db_router.read_session(token_user.username) as db:
+        yield db
+
 # --- Security Dependency ---
 # This dependency protects an endpoint and checks if the
 # user is 'police' or 'dmt'
@@ -50,75 +100,214 @@ async def get_police_or_dmt_user(
         )
     return current_user
 
+# --- Lookup Audit Helper ---
+# Queues the event in memory (see audit.py); it is written to the database in batches
+def record_lookup(current_user, query: str, lookup_type: str, result_status: str, source: str):
+    try:
+        audit.audit_log.record(current_user.username, query, lookup_type, result_status, source)
+    except audit.AuditQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Lookup audit log is busy, please retry",
+            headers={"Retry-After": "5"}
+        )
+
 # --- API Endpoints ---
 
+# --- Change Feed for Edge Replicas ---
+# Declared before /vehicles/{plate_number} so "changes" is not read as a plate
+@app.get("/vehicles/changes")
+async def get_vehicle_changes(
+    current_user: Annotated[models.User, Depends(get_police_or_dmt_user)],
+    since: int = Query(0, ge=0, description="Highest row_version the client already has"),
+    limit: int = Query(10000, ge=1, le=changes.MAX_FEED_LIMIT)
+):
+    return StreamingResponse(
+        changes.stream_vehicle_changes(since, limit),
+        media_type="application/x-ndjson"
+    )
+
+# --- DMT-Only Endpoint: Partial Search ---
+# Also declared before /vehicles/{plate_number}
+@app.get("/vehicles/search", response_model=schemas.VehicleSearchResponse)
+async def search_vehicles(
+    request: Request,
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)],
+    q: str = Query(..., min_length=search.MIN_QUERY_LENGTH, description="Part of a plate, owner name, NIC or licence number"),
+    limit: int = Query(20, ge=1, le=search.MAX_SEARCH_LIMIT),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db)
+):
+    try:
+        rows, next_cursor = search.search_vehicles(db, q, limit, after)
+    except search.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    content = {"results": responses.vehicle_list_json(rows), "next_cursor": next_cursor}
+    return responses.compressed_json(request, content)
+
 @app.get("/vehicles/{plate_number}", response_model=schemas.VehicleResponse)
 async def get_vehicle_details(
     plate_number: str,
     # This protects the endpoint so only police/dmt can use it
     current_user: Annotated[models.User, Depends(get_police_or_dmt_user)],
-    db: Session = Depends(get_db)
+    # Where the plate came from: typed in, or read by the ANPR service
+    source: Literal["manual", "anpr"] = "manual"
 ):
     # Clean the input plate number (remove spaces, convert to uppercase)
     cleaned_plate = re.sub(r'[^A-Za-z0-9]', '', plate_number).upper()
 
-    vehicle = db.query(Vehicle).filter(Vehicle.vehicle_number == cleaned_plate).first()
+    # Concurrent lookups for the same plate share one database query
+    vehicle = await lookups.find_vehicle_by_plate(cleaned_plate, current_user.username)
     
     if not vehicle:
+        record_lookup(current_user, cleaned_plate, "plate", "NOT_FOUND", source)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vehicle not found"
         )
 
     # --- The "Valid/Expired" Logic ---
-    today = date.today()
-    
-    status_str: str
-    if vehicle.licence_expiry_date < today:
-        status_str = "EXPIRED"
-    else:
-        status_str = "VALID"
-        
-    # Manually create the response model
-    response_data = schemas.VehicleResponse(
-        **vehicle.__dict__,  # Unpack all columns from the DB model
-        status=status_str      # Add our calculated status
-    )
-    
-    return response_data
+    # Adds the calculated status to a copy (the dict may be shared, see lookups.py)
+    response_data = responses.vehicle_json(vehicle)
+
+    record_lookup(current_user, cleaned_plate, "plate", response_data["status"], source)
+
+    # Already plain JSON-ready data: skip response_model validation
+    return responses.FastJSONResponse(response_data)
 
 # --- Public Endpoint: Search by License Number ---
 @app.get("/vehicles/license/{license_number}", response_model=schemas.VehicleResponse)
 async def get_vehicle_by_license(
     license_number: str,
     current_user: Annotated[models.User, Depends(get_current_user)], # Allow any authenticated user
-    db: Session = Depends(get_db)
+    source: Literal["manual", "anpr"] = "manual"
 ):
     # Clean input? Maybe just trim whitespace. License numbers might have dashes/spaces.
     # Let's assume exact match or simple trim for now.
     cleaned_license = license_number.strip()
 
-    vehicle = db.query(Vehicle).filter(Vehicle.licence_number == cleaned_license).first()
+    vehicle = await lookups.find_vehicle_by_license(cleaned_license, current_user.username)
 
     if not vehicle:
+        record_lookup(current_user, cleaned_license, "licence", "NOT_FOUND", source)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vehicle not found with this license number"
         )
 
     # Calculate status
-    today = date.today()
-    status_str: str
-    if vehicle.licence_expiry_date < today:
-        status_str = "EXPIRED"
-    else:
-        status_str = "VALID"
-
-    response_data = schemas.VehicleResponse(
-        **vehicle.__dict__,
-        status=status_str
+    response_data = responses.vehicle_json(vehicle)
+
+    record_lookup(current_user, cleaned_license, "licence", response_data["status"], source)
+
+    return responses.FastJSONResponse(response_data)
+
+# --- DMT-Only Endpoint: Lookup Coalescing Counters ---
+@app.get("/stats/lookups")
+async def get_lookup_stats(
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)]
+):
+    # "saved" = database queries avoided by sharing an in-flight lookup
+    return {**lookups.vehicle_lookups.stats(), "routing": db_router.stats()}
+
+# --- DMT-Only Endpoint: Lookup Audit Log ---
+# Events reach the table up to audit.FLUSH_INTERVAL seconds after the lookup
+@app.get("/lookup-events", response_model=list[schemas.LookupEventResponse])
+async def get_lookup_events(
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)],
+    db: Session = Depends(get_db),
+    query: Optional[str] = None,
+    user_email: Optional[str] = None,
+    source: Optional[Literal["manual", "anpr"]] = None,
+    result_status: Optional[Literal["VALID", "EXPIRED", "NOT_FOUND"]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before_id: Optional[int] = Query(None, description="Return events older than this id (next page)"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    q = db.query(models.LookupEvent)
+    if query:
+        # Plates are stored cleaned, licence numbers as typed (trimmed)
+        cleaned_plate = re.sub(r'[^A-Za-z0-9]', '', query).upper()
+        q = q.filter(models.LookupEvent.query.in_([cleaned_plate, query.strip()]))
+    if user_email:
+        q = q.filter(models.LookupEvent.user_email == user_email)
+    if source:
+        q = q.filter(models.LookupEvent.source == source)
+    if result_status:
+        q = q.filter(models.LookupEvent.result_status == result_status)
+    if since:
+        q = q.filter(models.LookupEvent.created_at >= since)
+    if until:
+        q = q.filter(models.LookupEvent.created_at < until)
+    if before_id:
+        q = q.filter(models.LookupEvent.id < before_id)
+
+    # Newest first; pass the last id as before_id to get the next page
+    return q.order_by(models.LookupEvent.id.desc()).limit(limit).all()
+
+@app.get("/stats/audit")
+async def get_audit_stats(
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)]
+):
+    return audit.audit_log.stats()
+
+# --- DMT-Only Endpoints: Expiry Scan ---
+# Normally runs by itself once a day; this runs any scan that is due now
+@app.post("/expiry-scan/run")
+async def run_expiry_scan(
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)]
+):
+    summaries = await run_in_threadpool(expiry_scan.expiry_scheduler.run_due)
+    return {"scans": summaries}
+
+@app.get("/stats/expiry-scan")
+async def get_expiry_scan_stats(
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)]
+):
+    return expiry_scan.expiry_scheduler.stats()
+
+# --- DMT-Only Endpoints: District Views & Reports ---
+# Routed to the district's partition (see partitions.py)
+def get_known_district(district: str) -> str:
+    name = partitions.normalize_district(district)
+    if not name:
+        raise HTTPException(status_code=404, detail="Unknown district")
+    return name
+
+@app.get("/districts/{district}/vehicles", response_model=schemas.VehiclePage)
+async def get_district_vehicles(
+    request: Request,
+    district: str,
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)],
+    after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    name = get_known_district(district)
+    rows = await run_in_threadpool(partitions.district_vehicles, name, after, limit + 1, dmt_user.username)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["vehicle_number"]
+    content = {"results": responses.vehicle_list_json(rows), "next_cursor": next_cursor}
+    return responses.compressed_json(request, content)
+
+@app.get("/reports/expiring", response_model=list[schemas.VehicleResponse])
+async def get_expiring_report(
+    request: Request,
+    dmt_user: Annotated[models.User, Depends(security.get_dmt_user)],
+    within_days: int = Query(30, ge=0, le=366),
+    district: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    # Without a district, all partitions are queried in parallel
+    name = get_known_district(district) if district else None
+    rows = await run_in_threadpool(
+        partitions.expiring_vehicles, within_days, district=name, limit=limit, username=dmt_user.username
     )
-    return response_data
+    return responses.compressed_json(request, responses.vehicle_list_json(rows))
 
 # --- DMT-Only Endpoint ---
 @app.post("/vehicles", response_model=schemas.VehicleResponse)
@@ -128,7 +317,13 @@ async def create_vehicle_registration(
     dmt_user: Annotated[models.User, Depends(security.get_dmt_user)],
     db: Session = Depends(get_db)
 ):
-    db_vehicle = db.query(Vehicle).filter(Vehicle.vehicle_number == vehicle.vehicle_number).first()
+    # Stored with the canonical name, so it lands in its district's partition
+    district = partitions.normalize_district(vehicle.district)
+    if not district:
+        raise HTTPException(status_code=422, detail=f"Unknown district '{vehicle.district}'")
+    vehicle.district = district
+
+    db_vehicle = db.query(Vehicle.vehicle_number).filter(Vehicle.vehicle_number == vehicle.vehicle_number).first()
     if db_vehicle:
         raise HTTPException(
             status_code=400, 
@@ -136,23 +331,20 @@ async def create_vehicle_registration(
         )
         
     new_vehicle = Vehicle(**vehicle.dict())
+    new_vehicle.row_version = changes.next_row_version(db)
     
     db.add(new_vehicle)
     db.commit()
-    db.refresh(new_vehicle)
+    db_router.note_write(dmt_user.username)
+
+    # The stored row is exactly what was sent, so no need to reload it
+    vehicle_data = vehicle.dict()
+
+    # Only does anything when the in-process search index is in use (SQLite)
+    search.fallback_index.add(vehicle_data)
 
     # We still need to calculate the status for the return
-    today = date.today()
-    status_str = "VALID"
-    if new_vehicle.licence_expiry_date < today:
-        status_str = "EXPIRED"
-
-    response_data = schemas.VehicleResponse(
-        **new_vehicle.__dict__,
-        status=status_str
-    )
-    
-    return response_data
+    return responses.FastJSONResponse(responses.vehicle_json(vehicle_data))
 
 # --- DMT-Only Endpoint: Renew License ---
 @app.put("/vehicles/{plate_number}/renew", response_model=schemas.VehicleResponse)
@@ -163,33 +355,38 @@ async def renew_vehicle_license(
     db: Session = Depends(get_db)
 ):
     cleaned_plate = re.sub(r'[^A-Za-z0-9]', '', plate_number).upper()
-    vehicle = db.query(Vehicle).filter(Vehicle.vehicle_number == cleaned_plate).first()
 
-    if not vehicle:
+    # Update fields; one UPDATE ... RETURNING instead of load, modify, reload
+    new_values = {
+        "licence_expiry_date": renewal_data.new_expiry_date,
+        "row_version": changes.next_row_version(db),
+    }
+    if renewal_data.new_valid_from:
+        new_values["licence_valid_from"] = renewal_data.new_valid_from
+
+    row = db.execute(
+        update(Vehicle)
+        .where(Vehicle.vehicle_number == cleaned_plate)
+        .values(**new_values)
+        .returning(*lookups.VEHICLE_COLUMNS)
+    ).first()
+
+    if not row:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vehicle not found"
         )
 
-    # Update fields
-    vehicle.licence_expiry_date = renewal_data.new_expiry_date
-    if renewal_data.new_valid_from:
-        vehicle.licence_valid_from = renewal_data.new_valid_from
-    
     db.commit()
-    db.refresh(vehicle)
+    db_router.note_write(dmt_user.username)
+
+    vehicle_data = dict(row._mapping)
+    # Replaces the stored row, so search shows the new expiry date (SQLite only)
+    search.fallback_index.add(vehicle_data)
 
     # Calculate status
-    today = date.today()
-    status_str = "VALID"
-    if vehicle.licence_expiry_date < today:
-        status_str = "EXPIRED"
-
-    response_data = schemas.VehicleResponse(
-        **vehicle.__dict__,
-        status=status_str
-    )
-    return response_data
+    return responses.FastJSONResponse(responses.vehicle_json(vehicle_data))
 
 # --- Helper Dependency: Get DB User from Token ---
 async def get_current_db_user(
@@ -202,7 +399,60 @@ async def get_current_db_user(
         raise HTTPException(status_code=404, detail="User not found in registry")
     return user
 
+# Same as above, for read-only endpoints
+async def get_current_read_db_user(
+    token_user: Annotated[models.User, Depends(get_current_user)],
+    db: Session = Depends(get_read_db)
+):
+    user = db.query(models.User).filter(models.User.email == token_user.username).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found in registry")
+    return user
+
 # --- Saved Vehicles Endpoints ---
+# Bulk-capable and paged; see saved_vehicles.py
+
+def clean_plates(plates: list[str]) -> list[str]:
+    # Cleaned like single plates, duplicates dropped, order kept
+    cleaned = (re.sub(r'[^A-Za-z0-9]', '', p).upper() for p in plates)
+    return list(dict.fromkeys(p for p in cleaned if p))
+
+def check_bulk_size(plates: list[str]):
+    if not plates:
+        raise HTTPException(status_code=400, detail="No plates given")
+    if len(plates) > saved_vehicles.MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {saved_vehicles.MAX_BULK_SIZE} plates per request"
+        )
+
+@app.post("/saved-vehicles", response_model=schemas.SavedVehiclesAddResult)
+async def save_vehicles_for_user(
+    bulk: schemas.SavedVehiclesBulkRequest,
+    user: Annotated[models.User, Depends(get_current_db_user)],
+    db: Session = Depends(get_db)
+):
+    plates = clean_plates(bulk.plates)
+    check_bulk_size(plates)
+
+    result = saved_vehicles.add_saved_vehicles(db, user.id, plates)
+    if result["added"]:
+        db_router.note_write(user.email)
+    return result
+
+@app.delete("/saved-vehicles", response_model=schemas.SavedVehiclesRemoveResult)
+async def remove_saved_vehicles(
+    bulk: schemas.SavedVehiclesBulkRequest,
+    user: Annotated[models.User, Depends(get_current_db_user)],
+    db: Session = Depends(get_db)
+):
+    plates = clean_plates(bulk.plates)
+    check_bulk_size(plates)
+
+    result = saved_vehicles.remove_saved_vehicles(db, user.id, plates)
+    if result["removed"]:
+        db_router.note_write(user.email)
+    return result
 
 @app.post("/saved-vehicles/{plate_number}")
 async def save_vehicle_for_user(
@@ -212,25 +462,16 @@ async def save_vehicle_for_user(
 ):
     # Clean plate
     cleaned_plate = re.sub(r'[^A-Za-z0-9]', '', plate_number).upper()
-    
-    # Check if vehicle exists
-    vehicle = db.query(Vehicle).filter(Vehicle.vehicle_number == cleaned_plate).first()
-    if not vehicle:
-        raise HTTPException(status_code=404, detail="Vehicle not found")
 
-    # Check if already saved
-    existing = db.query(models.UserSavedVehicle).filter(
-        models.UserSavedVehicle.user_id == user.id,
-        models.UserSavedVehicle.vehicle_number == cleaned_plate
-    ).first()
-    
-    if existing:
+    # One INSERT; unknown and already-saved plates are skipped by the database
+    result = saved_vehicles.add_saved_vehicles(db, user.id, [cleaned_plate])
+
+    if result["not_found"]:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    if result["already_saved"]:
         return JSONResponse(status_code=409, content={"detail": "Vehicle already saved"})
 
-    # Save
-    saved = models.UserSavedVehicle(user_id=user.id, vehicle_number=cleaned_plate)
-    db.add(saved)
-    db.commit()
+    db_router.note_write(user.email)
     return {"message": "Vehicle saved successfully"}
 
 @app.delete("/saved-vehicles/{plate_number}")
@@ -240,45 +481,33 @@ async def remove_saved_vehicle(
     db: Session = Depends(get_db)
 ):
     cleaned_plate = re.sub(r'[^A-Za-z0-9]', '', plate_number).upper()
-    
-    saved_vehicle = db.query(models.UserSavedVehicle).filter(
-        models.UserSavedVehicle.user_id == user.id,
-        models.UserSavedVehicle.vehicle_number == cleaned_plate
-    ).first()
 
-    if not saved_vehicle:
+    result = saved_vehicles.remove_saved_vehicles(db, user.id, [cleaned_plate])
+    if not result["removed"]:
         raise HTTPException(status_code=404, detail="Vehicle not found in your list")
-    
-    db.delete(saved_vehicle)
-    db.commit()
+
+    db_router.note_write(user.email)
     return {"message": "Vehicle removed successfully"}
 
 @app.get("/saved-vehicles", response_model=list[schemas.UserSavedVehicleResponse])
 async def get_user_saved_vehicles(
-    user: Annotated[models.User, Depends(get_current_db_user)],
-    db: Session = Depends(get_db)
+    request: Request,
+    user: Annotated[models.User, Depends(get_current_read_db_user)],
+    db: Session = Depends(get_read_db),
+    after: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=saved_vehicles.MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None)
 ):
-    # Join UserSavedVehicle with Vehicle
-    results = db.query(Vehicle).join(
-        models.UserSavedVehicle, 
-        models.UserSavedVehicle.vehicle_number == Vehicle.vehicle_number
-    ).filter(
-        models.UserSavedVehicle.user_id == user.id
-    ).all()
-
-    response_list = []
-    today = date.today()
-
-    for v in results:
-        status_str = "VALID"
-        if v.licence_expiry_date < today:
-            status_str = "EXPIRED"
-
-        response_list.append(
-            schemas.UserSavedVehicleResponse(
-                **v.__dict__,
-                status=status_str
-            )
-        )
-
-    return response_list
+    # Conditional GET: nothing changed since the client's copy -> 304, no body
+    etag = saved_vehicles.list_etag(db, user.id, after, limit)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if saved_vehicles.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    # One extra row tells us whether there is a next page
+    rows = saved_vehicles.saved_vehicles_page(db, user.id, after, limit + 1)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        cache_headers["X-Next-Cursor"] = rows[-1]["vehicle_number"]
+
+    return responses.compressed_json(request, responses.vehicle_list_json(rows), headers=cache_headers)
@@ -1,8 +1,31 @@
-from sqlalchemy import Column, String, Date, Integer, Boolean, ForeignKey
+from sqlalchemy import Column, String, Date, DateTime, Integer, BigInteger, Boolean, ForeignKey, Sequence, Index
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 import uuid
 from database import Base
 
+# Global counter for vehicle changes. Every create/renew stamps the row
+# with the next value, so edge replicas can ask for "changes since N".
+vehicle_version_seq = Sequence("vehicle_row_version_seq", metadata=Base.metadata)
+
+
+class next_row_version_default(FunctionElement):
+    """Column default for row_version: the sequence, like data_setup.sql."""
+    name = "next_row_version_default"
+    inherit_cache = True
+
+
+@compiles(next_row_version_default)
+def _next_row_version_default(element, compiler, **kw):
+    return compiler.process(vehicle_version_seq.next_value(), **kw)
+
+
+@compiles(next_row_version_default, "sqlite")
+def _next_row_version_default_sqlite(element, compiler, **kw):
+    # SQLite (tests) has no sequences: writes must set it (changes.next_row_version)
+    return "NULL"
+
 # This is the correct Vehicle model
 class Vehicle(Base):
     __tablename__ = "vehicles"
@@ -21,7 +44,12 @@ class Vehicle(Base):
     # --- Licence Details ---
     licence_number = Column(String(50), unique=True, nullable=False)
     licence_valid_from = Column(Date)
-    licence_expiry_date = Column(Date, nullable=False) # Moved from User to Vehicle
+    licence_expiry_date = Column(Date, nullable=False, index=True) # Moved from User to Vehicle; indexed for the expiry scan
+
+    # --- Change Tracking ---
+    # Set by create/renew (see changes.next_row_version), used as the change feed cursor.
+    # Rows inserted without it get the next sequence value (SQLite: NOT NULL error)
+    row_version = Column(BigInteger, nullable=False, server_default=next_row_version_default(), index=True)
 
 
 # This is the correct User model
@@ -42,11 +70,41 @@ class UserSavedVehicle(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    vehicle_number = Column(String(20), ForeignKey("vehicles.vehicle_number"), nullable=False)
+    vehicle_number = Column(String(20), ForeignKey("vehicles.vehicle_number"), nullable=False, index=True)
     
     # Optional: Date added
     # date_added = Column(Date, default=date.today)
 
+    # One row per (user, vehicle); bulk saves rely on it (ON CONFLICT DO NOTHING)
+    # and the saved list is paged with it
+    __table_args__ = (
+        Index("uq_user_saved_vehicles_user_vehicle", "user_id", "vehicle_number", unique=True),
+    )
+
     # Relationship (optional, for convenience)
     # user = relationship("User", back_populates="saved_vehicles")
     # vehicle = relationship("Vehicle")
+
+
+# Audit log: one row per plate/licence lookup (written in batches by audit.py)
+class LookupEvent(Base):
+    __tablename__ = "lookup_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_email = Column(String, index=True)       # who looked it up (token subject)
+    query = Column(String(50), index=True)        # cleaned plate or licence number
+    lookup_type = Column(String(10))              # 'plate' or 'licence'
+    result_status = Column(String(20))            # 'VALID', 'EXPIRED' or 'NOT_FOUND'
+    source = Column(String(20))                   # 'anpr' or 'manual'
+    created_at = Column(DateTime, index=True)     # UTC
+
+
+# One row per day the expiry scan ran (see expiry_scan.py). Inserting the
+# row claims the day, so the scan runs once even with several workers.
+class ExpiryScanRun(Base):
+    __tablename__ = "expiry_scan_runs"
+
+    scan_date = Column(Date, primary_key=True)
+    started_at = Column(DateTime, nullable=False)  # UTC
+    finished_at = Column(DateTime)                 # NULL while running (or if its worker crashed)
+    notified = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,201 @@
+# Benchmark: district-partitioned vs unpartitioned vehicles table.
+#
+# Builds two copies of a synthetic registry in a scratch schema
+# ('partition_bench') of the configured PostgreSQL database - one plain
+# table and one LIST-partitioned by district, like
+# migrations/003_partition_vehicles_by_district.sql - and times the
+# queries the registry service runs against each:
+#   - plate lookup (district unknown / known)
+#   - district admin page (100 vehicles of one district)
+#   - expiry report for one district, and for all districts
+#     (single query vs. parallel per-partition fan-out)
+#
+# How to use (from the vehicle_registry_service folder):
+#   python partition_benchmark.py --rows 2000000
+#   python partition_benchmark.py --rows 2000000 --keep   (keep the scratch schema)
+#
+import argparse
+import heapq
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from database import engine
+from partitions import DISTRICTS, FAN_OUT_WORKERS, partition_name
+
+SCHEMA = "partition_bench"
+REPORT_LIMIT = 1000
+PAGE_SIZE = 100
+
+COLUMNS = """
+    vehicle_number VARCHAR(20) NOT NULL,
+    licence_number VARCHAR(50) NOT NULL,
+    vehicle_class VARCHAR(100),
+    owner_name VARCHAR(255),
+    licence_expiry_date DATE NOT NULL,
+    district VARCHAR(100) NOT NULL
+"""
+
+
+# ==============================
+# 1. Synthetic data
+# ==============================
+def setup(rows: int):
+    print(f"Creating {rows} synthetic vehicles in schema '{SCHEMA}'...")
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+        conn.execute(text(f"CREATE TABLE {SCHEMA}.flat ({COLUMNS}, PRIMARY KEY (vehicle_number))"))
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.part ({COLUMNS}, PRIMARY KEY (vehicle_number, district)) "
+            f"PARTITION BY LIST (district)"
+        ))
+        for district in DISTRICTS:
+            conn.execute(text(
+                f"CREATE TABLE {SCHEMA}.{partition_name(district)} "
+                f"PARTITION OF {SCHEMA}.part FOR VALUES IN (:d)"
+            ).bindparams(d=district))
+        conn.execute(text(f"CREATE TABLE {SCHEMA}.vehicles_other PARTITION OF {SCHEMA}.part DEFAULT"))
+
+        # Skewed like the real registry: Colombo/Gampaha get far more vehicles
+        conn.execute(text(f"""
+            INSERT INTO {SCHEMA}.flat
+            SELECT
+                'BX' || lpad(g::text, 8, '0'),
+                'LN-' || g,
+                (ARRAY['Motor Car', 'Motorcycle', 'Three-wheeler', 'Goods Vehicle'])[1 + g % 4],
+                'Owner ' || g,
+                DATE '2024-01-01' + (g * 7919 % 1095),
+                CASE WHEN g % 3 = 0 THEN 'Colombo'
+                     WHEN g % 5 = 0 THEN 'Gampaha'
+                     ELSE (:districts)[1 + (g * 31) % :n_districts] END
+            FROM generate_series(1, :rows) AS g
+        """), {"districts": list(DISTRICTS), "n_districts": len(DISTRICTS), "rows": rows})
+        conn.execute(text(f"INSERT INTO {SCHEMA}.part SELECT * FROM {SCHEMA}.flat"))
+
+        for table in ("flat", "part"):
+            conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} (district, vehicle_number)"))
+            conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} (licence_expiry_date, vehicle_number)"))
+            conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} (district, licence_expiry_date)"))
+            conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+    print(f"Setup took {time.perf_counter() - start:.1f}s")
+
+
+# ==============================
+# 2. Timing helpers
+# ==============================
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return p50 * 1000, p95 * 1000
+
+
+def time_query(sql: str, params_list: list[dict]) -> tuple[float, float]:
+    samples = []
+    with engine.connect() as conn:
+        stmt = text(sql)
+        for params in params_list:
+            start = time.perf_counter()
+            conn.execute(stmt, params).fetchall()
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def time_fan_out(sql: str, params_list: list[dict], executor: ThreadPoolExecutor) -> tuple[float, float]:
+    """Same query once per district in parallel, merged - what partitions.py does."""
+    stmt = text(sql)
+
+    def one(district, params):
+        with engine.connect() as conn:
+            return conn.execute(stmt, {**params, "district": district}).fetchall()
+
+    samples = []
+    for params in params_list:
+        start = time.perf_counter()
+        parts = list(executor.map(lambda d: one(d, params), DISTRICTS))
+        merged = heapq.merge(*parts, key=lambda r: (r.licence_expiry_date, r.vehicle_number))
+        [row for _, row in zip(range(REPORT_LIMIT), merged)]
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+# ==============================
+# 3. Benchmark
+# ==============================
+def run(rows: int, repeat: int):
+    rng = random.Random(42)
+    plates = [{"plate": f"BX{rng.randint(1, rows):08d}"} for _ in range(repeat)]
+    with engine.connect() as conn:
+        plate_districts = [
+            {"plate": p["plate"], "district": conn.execute(
+                text(f"SELECT district FROM {SCHEMA}.flat WHERE vehicle_number = :plate"), p).scalar()}
+            for p in plates
+        ]
+    districts = [{"district": rng.choice(DISTRICTS)} for _ in range(repeat)]
+    windows = []
+    for _ in range(repeat):
+        start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 1000))
+        windows.append({"from": start, "to": start + timedelta(days=30)})
+    district_windows = [{**w, **d} for w, d in zip(windows, districts)]
+
+    select = "SELECT vehicle_number, licence_number, vehicle_class, owner_name, licence_expiry_date, district"
+    report_where = "licence_expiry_date BETWEEN :from AND :to"
+    report_order = f"ORDER BY licence_expiry_date, vehicle_number LIMIT {REPORT_LIMIT}"
+
+    results = []
+    for table in ("flat", "part"):
+        t = f"{SCHEMA}.{table}"
+        results.append((table, "plate lookup (district unknown)",
+                        time_query(f"{select} FROM {t} WHERE vehicle_number = :plate", plates)))
+        results.append((table, "plate lookup (district known)",
+                        time_query(f"{select} FROM {t} WHERE vehicle_number = :plate AND district = :district",
+                                   plate_districts)))
+        results.append((table, f"district page ({PAGE_SIZE} rows)",
+                        time_query(f"{select} FROM {t} WHERE district = :district "
+                                   f"ORDER BY vehicle_number LIMIT {PAGE_SIZE}", districts)))
+        results.append((table, "expiry report, one district",
+                        time_query(f"{select} FROM {t} WHERE district = :district AND {report_where} "
+                                   f"{report_order}", district_windows)))
+        results.append((table, "expiry report, all districts",
+                        time_query(f"{select} FROM {t} WHERE {report_where} {report_order}", windows)))
+
+    with ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS) as executor:
+        results.append(("part", "expiry report, all districts (fan-out)",
+                        time_fan_out(f"{select} FROM {SCHEMA}.part WHERE district = :district "
+                                     f"AND {report_where} {report_order}", windows, executor)))
+
+    print(f"\n--- Partition Benchmark ({rows} vehicles, {repeat} runs each) ---")
+    print(f"{'table':<6} {'query':<42} {'p50 ms':>9} {'p95 ms':>9}")
+    for table, name, (p50, p95) in results:
+        print(f"{table:<6} {name:<42} {p50:>9.2f} {p95:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark district partitioning of the vehicles table.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=200, help="Runs per query")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    parser.add_argument("--skip-setup", action="store_true", help="Reuse data from a previous --keep run")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("This benchmark needs PostgreSQL (DATABASE_URL).")
+
+    if not args.skip_setup:
+        setup(args.rows)
+    try:
+        run(args.rows, args.repeat)
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# District-partitioned vehicle storage: query routing.
+#
+# migrations/003_partition_vehicles_by_district.sql turns the vehicles table
+# into a PostgreSQL LIST-partitioned table with one partition per district
+# (plus a default partition for anything else). This module is the routing
+# layer for district-level work (admin views, expiry reports):
+#
+# - When the district is known, the query filters on it, so PostgreSQL
+#   prunes the plan down to that one partition.
+# - When it is not, the same query is sent for every district in parallel,
+#   each on its own (read) connection, and the sorted results are merged.
+#   Each of those scans only touches one small partition and its indexes.
+#
+# Everything here also works on an unpartitioned table (and on SQLite), it
+# is just slower there.
+#
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import Column, MetaData, String, Table, inspect, or_, select
+
+from models import Vehicle
+from replicas import router
+
+# The 25 administrative districts of Sri Lanka; one partition each
+DISTRICTS = (
+    "Ampara", "Anuradhapura", "Badulla", "Batticaloa", "Colombo",
+    "Galle", "Gampaha", "Hambantota", "Jaffna", "Kalutara",
+    "Kandy", "Kegalle", "Kilinochchi", "Kurunegala", "Mannar",
+    "Matale", "Matara", "Monaragala", "Mullaitivu", "Nuwara Eliya",
+    "Polonnaruwa", "Puttalam", "Ratnapura", "Trincomalee", "Vavuniya",
+)
+# Pseudo-district for rows in the default partition
+OTHER_DISTRICT = None
+
+# Parallel partition queries; keep below the engine's pool size + overflow
+FAN_OUT_WORKERS = 8
+
+REPORT_COLUMNS = (
+    Vehicle.vehicle_number,
+    Vehicle.licence_number,
+    Vehicle.vehicle_class,
+    Vehicle.fuel_type,
+    Vehicle.owner_name,
+    Vehicle.owner_address,
+    Vehicle.licence_valid_from,
+    Vehicle.licence_expiry_date,
+    Vehicle.district,
+    Vehicle.owner_nic,
+)
+
+# Plate/licence -> district, created and kept in sync by migration 003. Not
+# in models.Base, so create_all() (and SQLite) never has it.
+vehicle_directory = Table(
+    "vehicle_directory",
+    MetaData(),
+    Column("vehicle_number", String(20), primary_key=True),
+    Column("licence_number", String(50), unique=True),
+    Column("district", String(100)),
+)
+
+# Whether migration 003 has run; checked once per process
+_partitioned: Optional[bool] = None
+
+_executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="district-fan-out")
+
+
+def normalize_district(district: str) -> Optional[str]:
+    """Match a district name case-insensitively; None if it is not a known district."""
+    wanted = " ".join(district.split()).lower()
+    for name in DISTRICTS:
+        if name.lower() == wanted:
+            return name
+    return None
+
+
+def partition_name(district: Optional[str]) -> str:
+    if district is OTHER_DISTRICT:
+        return "vehicles_other"
+    return "vehicles_" + district.lower().replace(" ", "_")
+
+
+def is_partitioned(db) -> bool:
+    """True if the vehicles table is partitioned (vehicle_directory exists)."""
+    global _partitioned
+    if _partitioned is None:
+        _partitioned = inspect(db.connection()).has_table(vehicle_directory.name)
+    return _partitioned
+
+
+def vehicle_district(db, column, value: str) -> Optional[str]:
+    """
+    District of the vehicle whose `column` (Vehicle.vehicle_number or
+    Vehicle.licence_number) equals `value`, from the directory's unique
+    index; None if there is no such vehicle.
+    """
+    return db.scalar(select(vehicle_directory.c.district).where(vehicle_directory.c[column.key] == value))
+
+
+def _district_filter(district: Optional[str]):
+    if district is OTHER_DISTRICT:
+        # Rows that went to the default partition
+        return or_(Vehicle.district.notin_(DISTRICTS), Vehicle.district.is_(None))
+    return Vehicle.district == district
+
+
+def _fan_out(fn, *args) -> list:
+    """Run fn(district, *args) once per partition in parallel; return the list of results."""
+    targets = list(DISTRICTS) + [OTHER_DISTRICT]
+    return list(_executor.map(lambda d: fn(d, *args), targets))
+
+
+# ==============================
+# 1. District admin view: all vehicles of a district, paged by plate
+# ==============================
+def district_vehicles(district: str, after: Optional[str], limit: int,
+                      username: Optional[str] = None) -> list[dict]:
+    # username: read-your-writes, a vehicle this user just registered is listed
+    with router.read_session(username) as db:
+        q = db.query(*REPORT_COLUMNS).filter(_district_filter(district))
+        if after:
+            q = q.filter(Vehicle.vehicle_number > after)
+        rows = q.order_by(Vehicle.vehicle_number).limit(limit).all()
+        return [dict(row._mapping) for row in rows]
+
+
+# ==============================
+# 2. Expiry report: licences expiring in [from_date, to_date]
+# ==============================
+def _expiring_in_district(district: Optional[str], from_date: date, to_date: date, limit: int,
+                          username: Optional[str] = None) -> list[dict]:
+    with router.read_session(username) as db:
+        rows = (
+            db.query(*REPORT_COLUMNS)
+            .filter(
+                _district_filter(district),
+                Vehicle.licence_expiry_date >= from_date,
+                Vehicle.licence_expiry_date <= to_date,
+            )
+            .order_by(Vehicle.licence_expiry_date, Vehicle.vehicle_number)
+            .limit(limit)
+            .all()
+        )
+        return [dict(row._mapping) for row in rows]
+
+
+def expiring_vehicles(within_days: int, district: Optional[str] = None, limit: int = 1000,
+                      today: date = None, username: Optional[str] = None) -> list[dict]:
+    """
+    Vehicles whose licence expires within the next `within_days` days,
+    soonest first. One partition if `district` is given, else all of
+    them in parallel. `username` gets read-your-writes (see replicas.py).
+    """
+    from_date = today or date.today()
+    to_date = from_date + timedelta(days=within_days)
+
+    if district:
+        return _expiring_in_district(district, from_date, to_date, limit, username)
+
+    # Each partition returns its own first `limit` rows already sorted;
+    # merging them gives the global first `limit` rows
+    per_district = _fan_out(_expiring_in_district, from_date, to_date, limit, username)
+    merged = heapq.merge(
+        *per_district,
+        key=lambda r: (r["licence_expiry_date"], r["vehicle_number"]),
+    )
+    return [row for _, row in zip(range(limit), merged)]
@@ -0,0 +1,126 @@
+# Tests for the rate limiting middleware (rate_limit.py).
+#
+# Runs a small app with the shared SQLite backend on a temporary file and
+# checks the 429 / Retry-After answer, that buckets refill, and that a
+# route's form field (login username, camera id) gets its own bucket. Also
+# checks that the three copies of rate_limit.py are still the same.
+#
+# How to use:
+#   python rate_limit_test.py
+#   (or: python -m pytest rate_limit_test.py)
+#
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI, Form
+from fastapi.testclient import TestClient
+
+import rate_limit
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# default: 2 requests at once, then one every 0.2 s
+BUDGETS = {"default": (5.0, 2), "login": (0.5, 2), "anpr": (0.5, 2)}
+
+
+def make_client(backend, **kwargs) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    @app.post("/login")
+    def login(username: str = Form(...)):
+        # The middleware read the body first; the app must still get it
+        return {"username": username}
+
+    @app.post("/recognize-plate")
+    def recognize_plate():
+        return {"ok": True}
+
+    app.add_middleware(rate_limit.RateLimitMiddleware, backend=backend, budgets=BUDGETS,
+                       enabled=True, **kwargs)
+    return TestClient(app)
+
+
+def sqlite_backend(tmp_dir: str) -> rate_limit.SQLiteBackend:
+    return rate_limit.SQLiteBackend(os.path.join(tmp_dir, "rate_limit.db"))
+
+
+def test_copies_are_identical():
+    copies = {}
+    for service in ("auth_service", "vehicle_registry_service", "anpr_service"):
+        with open(os.path.join(SERVICES_DIR, service, "rate_limit.py"), "rb") as f:
+            copies[service] = f.read()
+    assert len(set(copies.values())) == 1, "rate_limit.py differs between services: " + ", ".join(copies)
+
+
+def test_empty_bucket_answers_429_and_refills():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = make_client(sqlite_backend(tmp_dir))
+        assert [client.get("/ping").status_code for _ in range(2)] == [200, 200]
+
+        response = client.get("/ping")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        assert response.headers["RateLimit-Limit"] == "2"
+
+        time.sleep(0.25)
+        assert client.get("/ping").status_code == 200
+        assert client.get("/ping").status_code == 429
+
+
+def test_buckets_are_shared_through_the_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first = make_client(sqlite_backend(tmp_dir))
+        second = make_client(sqlite_backend(tmp_dir))   # e.g. another worker process
+        assert first.get("/ping").status_code == 200
+        assert second.get("/ping").status_code == 200
+        assert first.get("/ping").status_code == 429
+
+
+def test_login_is_keyed_by_username():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = make_client(sqlite_backend(tmp_dir), routes=[("POST", "/login", "login", "username")])
+
+        def login(username):
+            return client.post("/login", data={"username": username, "password": "x"}).status_code
+
+        assert [login("a@police.lk") for _ in range(3)] == [200, 200, 429]
+        assert client.post("/login", data={"username": "c@police.lk"}).json() == {"username": "c@police.lk"}
+        # Same IP (station NAT), different officer
+        assert login("b@police.lk") == 200
+
+        response = client.post("/login", data={"username": "a@police.lk", "password": "x"})
+        assert response.headers["Retry-After"] == "2"
+
+
+def test_anpr_is_keyed_by_known_camera():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = make_client(
+            sqlite_backend(tmp_dir),
+            routes=[("POST", "/recognize-plate", "anpr", "camera_id")],
+            key_values={"camera_id": {"CAM-1", "CAM-2"}},
+        )
+
+        def recognize(camera_id=None):
+            data = {"camera_id": camera_id} if camera_id else {}
+            files = {"file": ("frame.jpg", b"\xff\xd8" + b"0" * 1000, "image/jpeg")}
+            return client.post("/recognize-plate", data=data, files=files).status_code
+
+        assert [recognize("CAM-1") for _ in range(3)] == [200, 200, 429]
+        assert recognize("CAM-2") == 200
+        # Unknown cameras and manual uploads share the caller's bucket
+        assert [recognize("CAM-99"), recognize(), recognize("CAM-98")] == [200, 200, 429]
+
+
+if __name__ == "__main__":
+    print("--- Rate Limiting Test ---")
+    test_copies_are_identical()
+    test_empty_bucket_answers_429_and_refills()
+    test_buckets_are_shared_through_the_file()
+    test_login_is_keyed_by_username()
+    test_anpr_is_keyed_by_known_camera()
+    print("\n✅ SUCCESS: all rate limiting checks passed.")
@@ -0,0 +1,177 @@
+# Reader for the offline registry snapshot (built by snapshot_builder.py).
+#
+# The snapshot is a single read-only SQLite file with one compact row per
+# vehicle (plate, licence number, expiry date, class) plus a Bloom filter
+# of all registered plates. Devices and the ANPR node load it once and
+# answer "is this plate registered / is its licence valid?" locally,
+# without a network round trip.
+#
+# This file only uses the Python standard library so it can be copied
+# to an edge device as-is.
+#
+# How to use:
+#   snapshot = RegistrySnapshot("registry.snapshot")
+#   snapshot.status("KMS 6479")   # -> "VALID", "EXPIRED" or "NOT_FOUND"
+#
+#   python registry_snapshot.py registry.snapshot --bench   (lookup timings)
+#
+import hashlib
+import math
+import re
+import sqlite3
+from datetime import date
+from typing import NamedTuple, Optional
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Let SQLite read the file through mmap instead of copying pages into its cache
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+
+_NON_ALPHANUMERIC = re.compile(r'[^A-Za-z0-9]')
+
+
+def clean_plate(plate_number: str) -> str:
+    # Same cleaning as the registry API (remove spaces etc., uppercase)
+    return _NON_ALPHANUMERIC.sub('', plate_number).upper()
+
+
+# ==============================
+# 1. Bloom filter of registered plates
+# ==============================
+class BloomFilter:
+    """
+    Plain Bloom filter over a bytearray, using double hashing of one
+    blake2b digest. A negative answer is always right; a positive one
+    is wrong with probability ~false_positive_rate.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: bytes = None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float = 0.001) -> "BloomFilter":
+        capacity = max(1, capacity)
+        num_bits = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+# ==============================
+# 2. Snapshot reader
+# ==============================
+class SnapshotVehicle(NamedTuple):
+    vehicle_number: str
+    licence_number: str
+    licence_expiry_date: date
+    vehicle_class: Optional[str]
+
+
+class RegistrySnapshot:
+    def __init__(self, path: str, mmap_size: int = DEFAULT_MMAP_SIZE):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        if int(self.meta["format_version"]) != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Snapshot format {self.meta['format_version']} is not supported "
+                f"(expected {SNAPSHOT_FORMAT_VERSION})"
+            )
+        self.bloom = BloomFilter(
+            int(self.meta["bloom_bits"]),
+            int(self.meta["bloom_hashes"]),
+            self.meta["bloom"],
+        )
+
+    @property
+    def cursor(self) -> int:
+        """row_version the snapshot is current to; pass it as ?since= to /vehicles/changes."""
+        return int(self.meta["cursor"])
+
+    @property
+    def row_count(self) -> int:
+        return int(self.meta["row_count"])
+
+    def might_contain(self, plate_number: str) -> bool:
+        """Bloom-filter only check: False means the plate is definitely not registered."""
+        return clean_plate(plate_number) in self.bloom
+
+    def lookup(self, plate_number: str) -> Optional[SnapshotVehicle]:
+        plate = clean_plate(plate_number)
+        # Most unregistered plates are rejected here without touching the file
+        if plate not in self.bloom:
+            return None
+        row = self._conn.execute(
+            "SELECT vehicle_number, licence_number, expiry, vehicle_class "
+            "FROM vehicles WHERE vehicle_number = ?",
+            (plate,),
+        ).fetchone()
+        if row is None:
+            return None
+        return SnapshotVehicle(row[0], row[1], date.fromordinal(row[2]), row[3])
+
+    def status(self, plate_number: str, today: date = None) -> str:
+        """Same answer as the API's status field, or "NOT_FOUND"."""
+        vehicle = self.lookup(plate_number)
+        if vehicle is None:
+            return "NOT_FOUND"
+        if vehicle.licence_expiry_date < (today or date.today()):
+            return "EXPIRED"
+        return "VALID"
+
+    def close(self):
+        self._conn.close()
+
+
+def _bench(snapshot: RegistrySnapshot, rounds: int = 20000):
+    import time
+
+    plates = [row[0] for row in snapshot._conn.execute(
+        "SELECT vehicle_number FROM vehicles LIMIT 1000")]
+    if not plates:
+        print("Snapshot is empty.")
+        return
+    missing = [f"ZZ{i:05d}X" for i in range(1000)]
+
+    for label, keys in (("registered", plates), ("not registered", missing)):
+        start = time.perf_counter()
+        for i in range(rounds):
+            snapshot.status(keys[i % len(keys)])
+        elapsed = time.perf_counter() - start
+        print(f"{label:<15} {elapsed / rounds * 1e6:.2f} µs per lookup")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect an offline registry snapshot.")
+    parser.add_argument("path")
+    parser.add_argument("plates", nargs="*", help="Plates to look up")
+    parser.add_argument("--bench", action="store_true", help="Measure lookup latency")
+    args = parser.parse_args()
+
+    snapshot = RegistrySnapshot(args.path)
+    print(f"{snapshot.row_count} vehicles, cursor {snapshot.cursor}, built {snapshot.meta['created_at']}")
+    for plate in args.plates:
+        print(f"{plate}: {snapshot.status(plate)} {snapshot.lookup(plate)}")
+    if args.bench:
+        _bench(snapshot)
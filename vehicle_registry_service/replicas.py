@@ -0,0 +1,127 @@
+# Read/write splitting for the registry database.
+#
+# Lookups outnumber writes by orders of magnitude, so read-only endpoints
+# (plate/licence lookups, the saved-vehicles list) can be served by read
+# replicas while creates, renewals and saves keep using the primary.
+#
+#   REPLICA_DATABASE_URLS="postgresql://.../replica1,postgresql://.../replica2"
+#
+# - Replicas are used round-robin. Every connection checkout is health
+#   checked (pool_pre_ping); a replica that fails is skipped for
+#   REPLICA_RETRY_AFTER seconds, and if none is healthy the primary is used.
+# - Read-your-writes: after a user changes something (note_write), that
+#   user's reads go to the primary for READ_YOUR_WRITES_WINDOW seconds, so
+#   they never see their own change missing because of replication lag.
+#   This is tracked per process; run one worker per replica set or keep
+#   the window longer than the worst replication lag.
+#
+# Without REPLICA_DATABASE_URLS everything uses the primary, as before.
+#
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from database import engine as primary_engine
+
+REPLICA_DATABASE_URLS = [
+    url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()
+]
+REPLICA_RETRY_AFTER = 30.0  # seconds
+READ_YOUR_WRITES_WINDOW = 10.0  # seconds
+
+
+class ReplicaRouter:
+    def __init__(self, primary: Engine, replica_urls: list[str]):
+        self.primary = primary
+        self.replicas = [create_engine(url, pool_pre_ping=True) for url in replica_urls]
+        self._rotation = itertools.count()
+        self._lock = threading.Lock()
+        self._down_until: dict[int, float] = {}
+        self._recent_writers: dict[str, float] = {}
+
+        # Counters
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.replica_failures = 0
+
+    # --- Read-your-writes ---
+    def note_write(self, username: Optional[str]):
+        """Call after committing a change made by this user."""
+        if username and self.replicas:
+            with self._lock:
+                self._recent_writers[username] = time.monotonic() + READ_YOUR_WRITES_WINDOW
+
+    def recently_wrote(self, username: Optional[str]) -> bool:
+        """True while this user's reads must go to the primary."""
+        if not username or not self.replicas:
+            return False
+        with self._lock:
+            until = self._recent_writers.get(username)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self._recent_writers[username]
+                return False
+            return True
+
+    # --- Replica selection ---
+    def _connect_replica(self) -> Optional[Connection]:
+        if not self.replicas:
+            return None
+        start = next(self._rotation)
+        now = time.monotonic()
+        for i in range(len(self.replicas)):
+            index = (start + i) % len(self.replicas)
+            if self._down_until.get(index, 0) > now:
+                continue
+            try:
+                # pool_pre_ping makes this fail fast if the replica is unreachable
+                return self.replicas[index].connect()
+            except DBAPIError as e:
+                self.replica_failures += 1
+                self._down_until[index] = now + REPLICA_RETRY_AFTER
+                print(f"Replica {index} unavailable, skipping for {REPLICA_RETRY_AFTER:.0f}s: {e}")
+        return None
+
+    @contextmanager
+    def read_session(self, username: Optional[str] = None, primary: bool = False):
+        """
+        Session for read-only work: a healthy replica, or the primary when
+        asked for, when the user just wrote something, or as a fallback.
+        """
+        conn = None
+        if not primary and not self.recently_wrote(username):
+            conn = self._connect_replica()
+        if conn is None:
+            self.primary_reads += 1
+            conn = self.primary.connect()
+        else:
+            self.replica_reads += 1
+
+        db = Session(bind=conn)
+        try:
+            yield db
+        finally:
+            db.close()
+            conn.close()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": len(self.replicas),
+            "replicas_down": sum(1 for until in self._down_until.values() if until > now),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "replica_failures": self.replica_failures,
+        }
+
+
+router = ReplicaRouter(primary_engine, REPLICA_DATABASE_URLS)
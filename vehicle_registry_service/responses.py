@@ -0,0 +1,103 @@
+# Lean JSON responses for the vehicle endpoints.
+#
+# Rows are selected as column tuples (see lookups.VEHICLE_COLUMNS) and
+# turned into plain dicts, so there is nothing left to validate: the
+# endpoints return these responses directly and FastAPI skips its
+# response_model round trip (build model -> validate -> jsonable_encoder
+# -> json.dumps). The response_model declarations stay for the API docs.
+#
+# - orjson writes dates, datetimes and UUIDs natively and is several times
+#   faster than the standard json module.
+# - List responses are compressed when the client accepts it: brotli if
+#   the optional `brotli` package is installed, otherwise gzip. Small
+#   bodies are sent as they are.
+#
+# Run serialization_benchmark.py to compare with the default path.
+#
+import gzip
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # fast; higher levels cost far more CPU for a few % smaller
+
+
+def _default(value):
+    # Search scores come back from the database as Decimal
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+# ==============================
+# 1. Vehicle rows
+# ==============================
+def licence_status(expiry_date: date, today: date) -> str:
+    return "EXPIRED" if expiry_date < today else "VALID"
+
+
+def vehicle_json(row: dict, today: date = None) -> dict:
+    """A vehicle row (dict of VEHICLE_COLUMNS) plus its VALID/EXPIRED status."""
+    today = today or date.today()
+    return {**row, "status": licence_status(row["licence_expiry_date"], today)}
+
+
+def vehicle_list_json(rows: list[dict], today: date = None) -> list[dict]:
+    today = today or date.today()
+    return [vehicle_json(row, today) for row in rows]
+
+
+# ==============================
+# 2. Compression
+# ==============================
+def _accepted_encodings(request: Request) -> set[str]:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def compressed_json(request: Request, content, status_code: int = 200,
+                    headers: Optional[dict] = None) -> Response:
+    """JSON response, brotli/gzip compressed if the client accepts it and it is big enough."""
+    body = orjson.dumps(content, default=_default)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+
+    if len(body) >= MIN_COMPRESS_SIZE:
+        accepted = _accepted_encodings(request)
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted or "*" in accepted:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
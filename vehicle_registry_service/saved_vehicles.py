@@ -0,0 +1,131 @@
+# Saved-vehicles list: bulk add/remove, keyset pages and ETags.
+#
+# - Adding is one INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING:
+#   the SELECT from vehicles skips unknown plates and the unique index on
+#   (user_id, vehicle_number) skips ones already saved, so there is no
+#   per-plate "does it exist / is it saved" query. Removing is one
+#   DELETE ... RETURNING.
+# - The list is paged by plate (the same unique index serves
+#   "WHERE user_id = ? AND vehicle_number > ? ORDER BY vehicle_number").
+# - list_etag() is a fingerprint of the user's list: it changes when a
+#   vehicle is added or removed, when a saved vehicle is renewed (its
+#   row_version moves) and at midnight (VALID/EXPIRED may flip), so the
+#   app's periodic refresh can be answered with 304 Not Modified.
+#
+import hashlib
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from lookups import VEHICLE_COLUMNS
+from models import UserSavedVehicle, Vehicle
+
+# Most plates accepted by one bulk add/remove call
+MAX_BULK_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+
+def _insert_for(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def add_saved_vehicles(db: Session, user_id, plates: list[str]) -> dict:
+    """
+    Save the (cleaned, de-duplicated) plates for this user.
+    Returns {"added": [...], "already_saved": [...], "not_found": [...]}.
+    """
+    source = select(
+        literal(user_id, UserSavedVehicle.user_id.type),
+        Vehicle.vehicle_number,
+    ).where(Vehicle.vehicle_number.in_(plates))
+
+    stmt = (
+        _insert_for(db)(UserSavedVehicle)
+        .from_select(["user_id", "vehicle_number"], source)
+        .on_conflict_do_nothing(index_elements=["user_id", "vehicle_number"])
+        .returning(UserSavedVehicle.vehicle_number)
+    )
+    added = set(db.execute(stmt).scalars())
+    db.commit()
+
+    # Only when something was skipped: tell unknown plates from saved ones
+    skipped = [p for p in plates if p not in added]
+    known = set()
+    if skipped:
+        known = set(db.execute(
+            select(Vehicle.vehicle_number).where(Vehicle.vehicle_number.in_(skipped))
+        ).scalars())
+
+    return {
+        "added": [p for p in plates if p in added],
+        "already_saved": [p for p in skipped if p in known],
+        "not_found": [p for p in skipped if p not in known],
+    }
+
+
+def remove_saved_vehicles(db: Session, user_id, plates: list[str]) -> dict:
+    """Returns {"removed": [...], "not_saved": [...]}."""
+    stmt = (
+        delete(UserSavedVehicle)
+        .where(
+            UserSavedVehicle.user_id == user_id,
+            UserSavedVehicle.vehicle_number.in_(plates),
+        )
+        .returning(UserSavedVehicle.vehicle_number)
+    )
+    removed = set(db.execute(stmt).scalars())
+    db.commit()
+    return {
+        "removed": [p for p in plates if p in removed],
+        "not_saved": [p for p in plates if p not in removed],
+    }
+
+
+def saved_vehicles_page(db: Session, user_id, after: Optional[str], limit: int) -> list[dict]:
+    """The user's saved vehicles ordered by plate, starting after `after`."""
+    stmt = (
+        select(*VEHICLE_COLUMNS)
+        .join(UserSavedVehicle, UserSavedVehicle.vehicle_number == Vehicle.vehicle_number)
+        .where(UserSavedVehicle.user_id == user_id)
+    )
+    if after:
+        stmt = stmt.where(UserSavedVehicle.vehicle_number > after)
+    stmt = stmt.order_by(UserSavedVehicle.vehicle_number).limit(limit)
+    return [dict(row._mapping) for row in db.execute(stmt)]
+
+
+def list_etag(db: Session, user_id, after: Optional[str], limit: int, today: date = None) -> str:
+    count, id_sum, max_id, max_version = db.execute(
+        select(
+            func.count(UserSavedVehicle.id),
+            func.coalesce(func.sum(UserSavedVehicle.id), 0),
+            func.max(UserSavedVehicle.id),
+            func.max(Vehicle.row_version),
+        )
+        .select_from(UserSavedVehicle)
+        .join(Vehicle, Vehicle.vehicle_number == UserSavedVehicle.vehicle_number)
+        .where(UserSavedVehicle.user_id == user_id)
+    ).one()
+
+    fingerprint = f"{count}:{id_sum}:{max_id}:{max_version}:{today or date.today()}:{after}:{limit}"
+    # Weak: the same list is sent gzip-compressed or not, so the bytes differ
+    return 'W/"' + hashlib.sha1(fingerprint.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 asks for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return _opaque_tag(etag) in (_opaque_tag(tag) for tag in candidates)
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, datetime
 from typing import Optional
 
 # Base model for a vehicle
@@ -38,3 +38,51 @@ class UserSavedVehicleResponse(VehicleResponse):
     
     class Config:
         from_attributes = True
+
+# Bulk add/remove of saved vehicles
+class SavedVehiclesBulkRequest(BaseModel):
+    plates: list[str]
+
+class SavedVehiclesAddResult(BaseModel):
+    added: list[str]
+    already_saved: list[str]
+    not_found: list[str]
+
+class SavedVehiclesRemoveResult(BaseModel):
+    removed: list[str]
+    not_saved: list[str]
+
+# A page of vehicles (district admin view); pass next_cursor as ?after=
+class VehiclePage(BaseModel):
+    results: list[VehicleResponse]
+    next_cursor: Optional[str] = None
+
+# One hit from GET /vehicles/search
+class VehicleSearchResult(BaseModel):
+    vehicle_number: str
+    licence_number: str
+    vehicle_class: Optional[str]
+    owner_name: Optional[str]
+    owner_nic: Optional[str]
+    district: Optional[str]
+    licence_expiry_date: date
+    status: str # 'VALID' or 'EXPIRED'
+    score: float
+
+# A page of search results; pass next_cursor as ?after= for the next page
+class VehicleSearchResponse(BaseModel):
+    results: list[VehicleSearchResult]
+    next_cursor: Optional[str] = None
+
+# One row of the lookup audit log (for DMT)
+class LookupEventResponse(BaseModel):
+    id: int
+    user_email: Optional[str]
+    query: str
+    lookup_type: str
+    result_status: str
+    source: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
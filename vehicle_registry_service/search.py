@@ -0,0 +1,285 @@
+# Partial search over plate, owner name, NIC and licence number (DMT admin).
+#
+# A query like "KM 64", "Perera" or part of an NIC matches a vehicle when
+#   - its words appear, in order, inside one of the fields
+#     ("KM 64" matches KMS6479, "2018" matches LN-2018-0345), or
+#   - it is similar enough to a field (pg_trgm's % operator, catches typos
+#     like "Pereira").
+# Results are ranked by score = 1 if the plate starts with the query, plus
+# the best trigram similarity of any field, and paged with a keyset cursor
+# ("<score>:<vehicle_number>").
+#
+# Every match must come from an index (see migrations/002_vehicle_search.sql):
+#   - plates starting with the first word ("KM 64" -> KM...), via the
+#     B-tree prefix index; this is the only way in for plate-like queries
+#     made of short fragments, which have no trigrams to look up
+#   - ILIKE and similarity via the pg_trgm GIN indexes, only when the
+#     query has a word of at least TRIGRAM_MIN_LENGTH characters
+# Each of these finds at most MAX_CANDIDATES vehicles; only those are
+# scored and sorted, so a vague query costs the same as a precise one
+# (and may not rank every match - a longer query narrows it down).
+#
+# SQLite (tests) has no pg_trgm, so an in-process trigram index with the
+# same matching and scoring rules is used instead.
+#
+import bisect
+import re
+import threading
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import Numeric, and_, case, cast, func, literal, or_, select, union
+from sqlalchemy.orm import Session
+
+from models import Vehicle
+
+MIN_QUERY_LENGTH = 2
+MAX_SEARCH_LIMIT = 100
+# Shorter words have no trigram an index could look up
+TRIGRAM_MIN_LENGTH = 3
+# Vehicles each index lookup may contribute before scoring
+MAX_CANDIDATES = 1000
+# Same default as pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+
+SEARCH_COLUMNS = (
+    Vehicle.vehicle_number,
+    Vehicle.licence_number,
+    Vehicle.vehicle_class,
+    Vehicle.owner_name,
+    Vehicle.owner_nic,
+    Vehicle.district,
+    Vehicle.licence_expiry_date,
+)
+
+_NON_ALPHANUMERIC = re.compile(r'[^A-Za-z0-9]')
+_WORDS = re.compile(r'[A-Za-z0-9]+')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# ==============================
+# 1. Query parsing & cursors
+# ==============================
+def _parse_query(q: str) -> tuple[str, str, list[str]]:
+    """Return (trimmed text, compact uppercase alphanumerics, words)."""
+    text = " ".join(q.split())
+    compact = _NON_ALPHANUMERIC.sub('', text).upper()
+    words = [w for w in _NON_ALPHANUMERIC.split(text) if w]
+    return text, compact, words
+
+
+def _uses_trigrams(words: list[str]) -> bool:
+    return any(len(w) >= TRIGRAM_MIN_LENGTH for w in words)
+
+
+def encode_cursor(score, vehicle_number: str) -> str:
+    return f"{Decimal(score):.4f}:{vehicle_number}"
+
+
+def decode_cursor(cursor: str) -> tuple[Decimal, str]:
+    try:
+        score, vehicle_number = cursor.split(":", 1)
+        return Decimal(score).quantize(Decimal("0.0001")), vehicle_number
+    except Exception:
+        raise InvalidCursor("Invalid search cursor")
+
+
+def search_vehicles(db: Session, q: str, limit: int, after: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+    """Return (rows as dicts incl. "score", cursor for the next page or None)."""
+    text, compact, words = _parse_query(q)
+    if len(compact) < MIN_QUERY_LENGTH:
+        return [], None
+    after_key = decode_cursor(after) if after else None
+
+    if db.get_bind().dialect.name == "postgresql":
+        rows = _search_postgres(db, text, compact, words, limit + 1, after_key)
+    else:
+        rows = fallback_index.search(db, text, compact, words, limit + 1, after_key)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["vehicle_number"])
+    return rows, next_cursor
+
+
+# ==============================
+# 2. PostgreSQL: pg_trgm
+# ==============================
+def _search_postgres(db: Session, text: str, compact: str, words: list[str], limit: int, after_key):
+    # "KM 64" -> '%KM%64%'
+    pattern = "%" + "%".join(words) + "%"
+
+    # Plates are stored uppercase; LIKE 'KM%' uses ix_vehicles_vehicle_number_prefix
+    arms = [and_(Vehicle.vehicle_number.like(words[0].upper() + "%"), Vehicle.vehicle_number.ilike(pattern))]
+    if _uses_trigrams(words):
+        # A word of 3+ characters gives pg_trgm trigrams to look up in the GIN indexes
+        arms += [
+            Vehicle.vehicle_number.ilike(pattern),
+            Vehicle.owner_name.ilike(pattern),
+            Vehicle.owner_nic.ilike(pattern),
+            Vehicle.licence_number.ilike(pattern),
+            Vehicle.owner_name.op("%")(text),
+        ]
+    # One capped index lookup per arm; only these candidates are scored
+    candidates = union(*(
+        select(Vehicle.vehicle_number).where(arm).limit(MAX_CANDIDATES) for arm in arms
+    )).subquery()
+
+    score = cast(
+        case((Vehicle.vehicle_number.like(compact + "%"), literal(1.0)), else_=literal(0.0))
+        + func.greatest(
+            func.similarity(Vehicle.vehicle_number, compact),
+            func.similarity(Vehicle.owner_name, text),
+            func.similarity(Vehicle.owner_nic, compact),
+            func.similarity(Vehicle.licence_number, text),
+        ),
+        Numeric(6, 4),
+    ).label("score")
+
+    ranked = (
+        select(*SEARCH_COLUMNS, score)
+        .join(candidates, candidates.c.vehicle_number == Vehicle.vehicle_number)
+        .subquery()
+    )
+    stmt = select(ranked)
+    if after_key:
+        after_score, after_plate = after_key
+        stmt = stmt.where(or_(
+            ranked.c.score < after_score,
+            and_(ranked.c.score == after_score, ranked.c.vehicle_number > after_plate),
+        ))
+    stmt = stmt.order_by(ranked.c.score.desc(), ranked.c.vehicle_number).limit(limit)
+
+    return [dict(row._mapping) for row in db.execute(stmt)]
+
+
+# ==============================
+# 3. Fallback: in-process trigram index
+# ==============================
+def trigrams(value: str) -> set[str]:
+    """Trigrams the way pg_trgm makes them: per word, lowercased, padded "  word "."""
+    grams = set()
+    for word in _WORDS.findall(value or ""):
+        padded = f"  {word.lower()} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NGramIndex:
+    """
+    Trigram -> vehicle_number postings, built from the vehicles table on the
+    first search and kept current by add(). Only meant for SQLite test runs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: dict[str, set[str]] = {}
+        self._docs: dict[str, dict] = {}
+        # Sorted, for prefix matches (the B-tree prefix index on PostgreSQL)
+        self._plates: list[str] = []
+        self._grams: dict[str, tuple] = {}
+        self.built = False
+
+    def build(self, db: Session):
+        with self._lock:
+            if self.built:
+                return
+            for row in db.query(*SEARCH_COLUMNS).yield_per(1000):
+                self._add(dict(row._mapping))
+            self.built = True
+
+    def add(self, vehicle: dict):
+        # Vehicles created before the first search are picked up by build()
+        with self._lock:
+            if self.built:
+                self._add(vehicle)
+
+    def _add(self, vehicle: dict):
+        plate = vehicle["vehicle_number"]
+        fields = (plate, vehicle["owner_name"], vehicle["owner_nic"], vehicle["licence_number"])
+        grams = tuple(trigrams(f) for f in fields)
+        if plate not in self._docs:
+            bisect.insort(self._plates, plate)
+        self._docs[plate] = {c.key: vehicle[c.key] for c in SEARCH_COLUMNS}
+        self._grams[plate] = grams
+        for gram in set().union(*grams):
+            self._postings.setdefault(gram, set()).add(plate)
+
+    def search(self, db: Session, text: str, compact: str, words: list[str], limit: int, after_key):
+        self.build(db)
+        pattern = re.compile(".*".join(re.escape(w) for w in words), re.IGNORECASE)
+        text_grams, compact_grams = trigrams(text), trigrams(compact)
+
+        prefix = words[0].upper()
+        use_trigrams = _uses_trigrams(words)
+
+        with self._lock:
+            # Plates starting with the first word
+            candidates = set()
+            i = bisect.bisect_left(self._plates, prefix)
+            while i < len(self._plates) and self._plates[i].startswith(prefix):
+                plate = self._plates[i]
+                if pattern.search(plate):
+                    candidates.add(plate)
+                    if len(candidates) >= MAX_CANDIDATES:
+                        break
+                i += 1
+
+            if use_trigrams:
+                found = set()
+                for gram in text_grams | compact_grams | _inner_trigrams(words):
+                    found |= self._postings.get(gram, set())
+                matched = []
+                for plate in sorted(found):
+                    doc = self._docs[plate]
+                    fields = (plate, doc["owner_name"], doc["owner_nic"], doc["licence_number"])
+                    if (any(f and pattern.search(f) for f in fields)
+                            or similarity(self._grams[plate][1], text_grams) >= SIMILARITY_THRESHOLD):
+                        matched.append(plate)
+                        if len(matched) >= MAX_CANDIDATES:
+                            break
+                candidates.update(matched)
+
+            results = []
+            for plate in candidates:
+                doc = self._docs[plate]
+                plate_g, name_g, nic_g, licence_g = self._grams[plate]
+                name_sim = similarity(name_g, text_grams)
+
+                score = (1.0 if plate.startswith(compact) else 0.0) + max(
+                    similarity(plate_g, compact_grams),
+                    name_sim,
+                    similarity(nic_g, compact_grams),
+                    similarity(licence_g, text_grams),
+                )
+                score = Decimal(score).quantize(Decimal("0.0001"))
+                # Keyset: only rows after the cursor in (score desc, plate asc) order
+                if after_key and not (score < after_key[0] or (score == after_key[0] and plate > after_key[1])):
+                    continue
+                results.append({**doc, "score": score})
+
+        results.sort(key=lambda r: (-r["score"], r["vehicle_number"]))
+        return results[:limit]
+
+
+def _inner_trigrams(words: list[str]) -> set[str]:
+    # Trigrams fully inside each query word; any field containing the
+    # word as a substring has all of them
+    grams = set()
+    for word in words:
+        w = word.lower()
+        grams.update(w[i:i + 3] for i in range(len(w) - 2))
+    return grams
+
+
+fallback_index = NGramIndex()
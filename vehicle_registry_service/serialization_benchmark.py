@@ -0,0 +1,134 @@
+# Benchmark: default FastAPI serialization vs the lean path in responses.py.
+#
+# Serves the same synthetic vehicle rows from a throwaway FastAPI app in two ways
+#   default: build VehicleResponse models, return them with response_model
+#            (validate again -> jsonable_encoder -> json.dumps)
+#   fast:    plain dicts + status, orjson, optional gzip/brotli (responses.py)
+# and calls it in-process through ASGI (no network, no database), so the
+# numbers are serialization cost only.
+#
+# Payloads match the registry's list and bulk endpoints:
+#   saved list page (100), district page (1000), expiry report (10000)
+#
+# How to use (from the vehicle_registry_service folder):
+#   python serialization_benchmark.py
+#   python serialization_benchmark.py --repeat 50 --sizes 100 1000
+#
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from fastapi import FastAPI, Request
+
+import responses
+import schemas
+
+PAYLOADS = {100: "saved list page", 1000: "district page", 10000: "expiry report"}
+
+
+def synthetic_rows(count: int) -> list[dict]:
+    rng = random.Random(36)
+    today = date.today()
+    rows = []
+    for i in range(count):
+        valid_from = today - timedelta(days=rng.randint(0, 700))
+        rows.append({
+            "vehicle_number": f"KM{i:06d}",
+            "licence_number": f"LN-2024-{i:06d}",
+            "vehicle_class": rng.choice(["Motor Car", "Motorcycle", "Three-wheeler"]),
+            "fuel_type": rng.choice(["Petrol", "Diesel", "Hybrid"]),
+            "owner_name": f"Owner {i}",
+            "owner_address": f"{i} Galle Road, Colombo",
+            "licence_valid_from": valid_from,
+            "licence_expiry_date": valid_from + timedelta(days=365),
+            "district": "Colombo",
+            "owner_nic": f"{199000000000 + i}",
+        })
+    return rows
+
+
+def build_app(rows: list[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/default", response_model=list[schemas.VehicleResponse])
+    async def default_path():
+        today = date.today()
+        response_list = []
+        for row in rows:
+            status_str = "VALID"
+            if row["licence_expiry_date"] < today:
+                status_str = "EXPIRED"
+            response_list.append(schemas.VehicleResponse(**row, status=status_str))
+        return response_list
+
+    @app.get("/fast", response_model=list[schemas.VehicleResponse])
+    async def fast_path(request: Request):
+        return responses.compressed_json(request, responses.vehicle_list_json(rows))
+
+    return app
+
+
+async def call(app: FastAPI, path: str, accept_encoding: str) -> int:
+    """One GET through the ASGI interface; returns the body size in bytes."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 1), "server": ("bench", 80),
+        "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else [],
+    }
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def measure(app: FastAPI, path: str, accept_encoding: str, repeat: int) -> tuple[float, int]:
+    await call(app, path, accept_encoding)  # warm-up
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = await call(app, path, accept_encoding)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, size
+
+
+async def run(sizes: list[int], repeat: int):
+    variants = [("default", "/default", ""), ("fast", "/fast", ""), ("fast+gzip", "/fast", "gzip")]
+    if responses.brotli is not None:
+        variants.append(("fast+br", "/fast", "br, gzip"))
+    else:
+        print("(brotli not installed, skipping br)")
+
+    print(f"{'payload':<26} {'path':<10} {'p50 ms':>9} {'KB':>9} {'speed-up':>9}")
+    for size in sizes:
+        app = build_app(synthetic_rows(size))
+        label = f"{PAYLOADS.get(size, 'list')} ({size})"
+        baseline = None
+        for name, path, encoding in variants:
+            p50, body = await measure(app, path, encoding, repeat)
+            baseline = baseline or p50
+            print(f"{label:<26} {name:<10} {p50:>9.2f} {body / 1024:>9.1f} {baseline / p50:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vehicle response serialization.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=sorted(PAYLOADS))
+    parser.add_argument("--repeat", type=int, default=20, help="Requests per measurement")
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Single-flight request coalescing.
+#
+# When a convoy passes several officers, or a camera sends several frames of
+# the same car, many identical lookups arrive at the same moment. Instead of
+# each one running its own database query, the first caller for a key runs
+# the query (in a worker thread, so the event loop is not blocked) and every
+# caller that arrives while it is still running awaits the same result.
+#
+import asyncio
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        # Counters: every call, calls that actually ran fn, and the difference
+        self.calls = 0
+        self.executed = 0
+
+    @property
+    def saved(self) -> int:
+        """Number of calls that were answered by another caller's query."""
+        return self.calls - self.executed
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "saved": self.saved,
+            "in_flight": len(self._in_flight),
+        }
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run fn(*args) in a worker thread, unless a call with the same key
+        is already running, in which case wait for and share its result
+        (or exception).
+        """
+        self.calls += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, fn, *args)
+            self._in_flight[key] = future
+            self.executed += 1
+            future.add_done_callback(lambda f: self._forget(key, f))
+
+        # shield: one client disconnecting must not cancel the query for the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
@@ -0,0 +1,131 @@
+# Builds the offline registry snapshot read by registry_snapshot.py.
+#
+# Streams the vehicles table through a server-side cursor (so memory stays
+# flat even for millions of rows), writes the compact rows and a Bloom
+# filter of plates into a new SQLite file, and swaps it into place
+# atomically so readers never see a half-written snapshot.
+#
+# How to use (from the vehicle_registry_service folder):
+#   python snapshot_builder.py --output registry.snapshot
+#   python snapshot_builder.py --output registry.snapshot --every 3600   (rebuild hourly)
+#
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+
+from database import SessionLocal
+from models import Vehicle
+from registry_snapshot import SNAPSHOT_FORMAT_VERSION, BloomFilter
+
+# Rows fetched per round trip from PostgreSQL / inserted per executemany
+BUILD_BATCH_SIZE = 10000
+BLOOM_FALSE_POSITIVE_RATE = 0.001
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        PRAGMA page_size = 4096;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID;
+        -- expiry is a date ordinal (days since 0001-01-01) to keep rows small
+        CREATE TABLE vehicles (
+            vehicle_number TEXT PRIMARY KEY,
+            licence_number TEXT NOT NULL,
+            expiry INTEGER NOT NULL,
+            vehicle_class TEXT
+        ) WITHOUT ROWID;
+    """)
+
+
+def build_snapshot(output_path: str) -> dict:
+    """Write a fresh snapshot to output_path and return its metadata."""
+    tmp_path = output_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = SessionLocal()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        _create_schema(conn)
+
+        # Size the Bloom filter up front; rows added meanwhile just raise the
+        # false positive rate slightly until the next build
+        expected = db.query(func.count(Vehicle.vehicle_number)).scalar() or 0
+        bloom = BloomFilter.for_capacity(expected, BLOOM_FALSE_POSITIVE_RATE)
+
+        rows = (
+            db.query(
+                Vehicle.vehicle_number,
+                Vehicle.licence_number,
+                Vehicle.licence_expiry_date,
+                Vehicle.vehicle_class,
+                Vehicle.row_version,
+            )
+            # Primary key order makes every insert an append to the B-tree
+            .order_by(Vehicle.vehicle_number)
+            .execution_options(stream_results=True)
+            .yield_per(BUILD_BATCH_SIZE)
+        )
+
+        count, cursor, batch = 0, 0, []
+        for plate, licence, expiry, vehicle_class, row_version in rows:
+            bloom.add(plate)
+            batch.append((plate, licence, expiry.toordinal(), vehicle_class))
+            cursor = max(cursor, row_version or 0)
+            if len(batch) >= BUILD_BATCH_SIZE:
+                conn.executemany("INSERT INTO vehicles VALUES (?, ?, ?, ?)", batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO vehicles VALUES (?, ?, ?, ?)", batch)
+            count += len(batch)
+
+        meta = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "row_count": count,
+            # Highest row_version included; edge nodes continue from here
+            # with GET /vehicles/changes?since=<cursor>
+            "cursor": cursor,
+            "bloom_bits": bloom.num_bits,
+            "bloom_hashes": bloom.num_hashes,
+            "bloom": bytes(bloom.bits),
+        }
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        conn.commit()
+    finally:
+        conn.close()
+        db.close()
+
+    # Atomic swap: readers keep the old file open until they reload
+    os.replace(tmp_path, output_path)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline registry snapshot.")
+    parser.add_argument("--output", "-o", default="registry.snapshot")
+    parser.add_argument("--every", type=int, default=None,
+                        help="Keep running and rebuild every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        start = time.perf_counter()
+        meta = build_snapshot(args.output)
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(args.output) / (1024 * 1024)
+        print(f"✅ Snapshot {args.output}: {meta['row_count']} vehicles, "
+              f"cursor {meta['cursor']}, {size_mb:.1f} MB in {elapsed:.1f}s")
+
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()